@@ -1,12 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, abort
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+from collections import OrderedDict
+import threading
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
-from sqlalchemy import case
+from sqlalchemy import event, and_, or_, case, func, update
+from sqlalchemy.orm import selectinload, contains_eager, defer, validates
+from sqlalchemy.orm.attributes import set_committed_value
 import argparse
+import base64
+import hashlib
+import json
 import os
 from authlib.integrations.flask_client import OAuth
 import requests
 from dotenv import load_dotenv
+from app_logging import setup_logging
+from write_buffer import SharedWriteBehindBuffer
+from bulk import bulk_insert
+from oauth_cache import ProviderMetadataCache
+import sqlite_perf
+import pg_pool
+from search import install_search_index, search
 
 # Environment-Variablen laden
 load_dotenv()
@@ -15,12 +31,30 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///todos.db')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dein-geheimer-schluessel')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Anzahl der SQL-Queries pro Request als X-Query-Count Header ausgeben (für Tests)
+app.config['QUERY_COUNT_HEADER'] = os.getenv('QUERY_COUNT_HEADER', '0') == '1'
+# Fließt in alle ETags ein, bei Template-/Code-Änderungen im Deployment erhöhen
+app.config['ETAG_VERSION'] = os.getenv('APP_VERSION', '1')
 
 # Google OAuth Konfiguration
 app.config['GOOGLE_CLIENT_ID'] = os.getenv('GOOGLE_CLIENT_ID')
 app.config['GOOGLE_CLIENT_SECRET'] = os.getenv('GOOGLE_CLIENT_SECRET')
+# Für Offline-Tests auf oauth_standin.py umbiegbar, z.B. http://127.0.0.1:9000/.well-known/openid-configuration
+app.config['OAUTH_METADATA_URL'] = os.getenv('OAUTH_METADATA_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+app.config['OAUTH_METADATA_CACHE'] = os.getenv('OAUTH_METADATA_CACHE', os.path.join(app.instance_path, 'oauth_metadata.json'))
+app.config['OAUTH_METADATA_TTL'] = int(os.getenv('OAUTH_METADATA_TTL', '21600'))
 
-db = SQLAlchemy(app)
+# Pool-Einstellungen für Postgres aus der Umgebung (siehe pg_pool.py)
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pg_pool.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# Optionaler SQLite-Performance-Modus (WAL, Lese-Pool, ein Writer pro Prozess)
+if sqlite_perf.is_enabled(app.config['SQLALCHEMY_DATABASE_URI']):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_perf.engine_options()
+    db = SQLAlchemy(app, session_options={'class_': sqlite_perf.RoutingSession})
+else:
+    db = SQLAlchemy(app)
+log = setup_logging(app)
 
 # OAuth Setup
 oauth = OAuth(app)
@@ -28,12 +62,21 @@ google = oauth.register(
     name='google',
     client_id=app.config['GOOGLE_CLIENT_ID'],
     client_secret=app.config['GOOGLE_CLIENT_SECRET'],
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    server_metadata_url=app.config['OAUTH_METADATA_URL'],
     client_kwargs={
         'scope': 'openid email profile'
     }
 )
 
+# Discovery-Metadaten und JWKS aus dem Cache statt bei jedem ersten Login aus dem Netz
+# (Vorladen im gunicorn-Master über when_ready, Refresh-Thread pro Worker über post_fork)
+google_metadata = ProviderMetadataCache(
+    app.config['OAUTH_METADATA_URL'],
+    app.config['OAUTH_METADATA_CACHE'],
+    ttl=app.config['OAUTH_METADATA_TTL']
+)
+google_metadata.attach(google)
+
 class TaskGroup(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -41,12 +84,23 @@ class TaskGroup(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     todos = db.relationship('Todo', backref='group', lazy=True, cascade='all, delete-orphan')
 
+# Sortierreihenfolge der Prioritäten (kleiner = wichtiger)
+PRIORITY_RANKS = {'urgent': 1, 'high': 2, 'medium': 3, 'low': 4}
+
 class Todo(db.Model):
+    __table_args__ = (
+        # Listen-Ansicht einer Gruppe (index)
+        db.Index('ix_todo_group_listing', 'group_id', 'parent_id', 'completed', 'priority_rank', 'created_at'),
+        # Offene Todos nach Deadline (deadlines, matrix)
+        db.Index('ix_todo_open_due', 'completed', 'parent_id', 'due_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     completed = db.Column(db.Boolean, default=False)
     priority = db.Column(db.String(10), default='medium')
+    priority_rank = db.Column(db.Integer, default=PRIORITY_RANKS['medium'], nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime, nullable=True)
     group_id = db.Column(db.Integer, db.ForeignKey('task_group.id'), nullable=False)
@@ -54,6 +108,12 @@ class Todo(db.Model):
     sub_todos = db.relationship('Todo', backref=db.backref('parent', remote_side=[id]), 
                               cascade='all, delete-orphan')
 
+    @validates('priority')
+    def validate_priority(self, key, priority):
+        # Rang bei jedem Schreiben der Priorität mitpflegen
+        self.priority_rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS['medium'])
+        return priority
+
     @property
     def is_sub_todo(self):
         return self.parent_id is not None
@@ -85,21 +145,351 @@ class User(db.Model):
     picture = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime, default=datetime.utcnow)
+    # Wird bei jeder Gruppenänderung erhöht, Schlüssel für den Navigations-Cache
+    groups_version = db.Column(db.Integer, default=0, nullable=False)
+    # Wird bei jeder Änderung an Todos, Gruppen oder Notizen erhöht (ETags)
+    data_version = db.Column(db.Integer, default=0, nullable=False)
+    # Höchste change_seq bereits entfernter Tombstones: ältere Sync-Cursor brauchen einen vollen Resync
+    notes_sync_floor = db.Column(db.Integer, default=0, nullable=False)
     
     # Beziehungen zu anderen Modellen
     groups = db.relationship('TaskGroup', backref='user', lazy=True, cascade='all, delete-orphan')
     notes = db.relationship('Note', backref='user', lazy=True, cascade='all, delete-orphan')
 
+# Länge der Vorschau in der Notizen-Liste
+NOTE_PREVIEW_LENGTH = 100
+# So lange werden gelöschte Notizen für den Delta-Sync gemerkt
+NOTE_TOMBSTONE_RETENTION = timedelta(days=int(os.getenv('NOTE_TOMBSTONE_RETENTION_DAYS', '30')))
+
 class Note(db.Model):
+    __table_args__ = (
+        db.Index('ix_note_user_change_seq', 'user_id', 'change_seq'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), default='Neue Notiz')
     content = db.Column(db.Text, default='')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # data_version des Users bei der letzten Änderung (Delta-Sync)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)
+    # Wird bei jeder Änderung erhöht, Basis für Delta-Saves (PATCH)
+    revision = db.Column(db.Integer, default=0, nullable=False)
+    # Vorschau wird in SQL gekürzt, damit Listen den Inhalt nicht laden müssen
+    preview = db.column_property(func.substr(content, 1, NOTE_PREVIEW_LENGTH))
+
+class NoteTombstone(db.Model):
+    """Merkt sich gelöschte Notizen, damit Clients sie per Delta-Sync entfernen"""
+    __table_args__ = (
+        db.Index('ix_note_tombstone_user_change_seq', 'user_id', 'change_seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 with app.app_context():
+    engines = [db.engine]
+    if sqlite_perf.is_enabled(app.config['SQLALCHEMY_DATABASE_URI']):
+        engines.append(sqlite_perf.init_app(app, db))
+
     db.create_all()
+    install_search_index(db.engine)
+
+    # Query-Zähler pro Request (nur aktiv wenn QUERY_COUNT_HEADER gesetzt ist)
+    def count_queries(conn, cursor, statement, parameters, context, executemany):
+        if app.config['QUERY_COUNT_HEADER'] and g:
+            g.query_count = g.get('query_count', 0) + 1
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count_queries)
+
+def reset_engines_after_fork():
+    """Vom Master geerbte Verbindungen im Worker nicht weiterverwenden (preload_app)"""
+    with app.app_context():
+        for engine in (db.engine, app.extensions.get('sqlite_read_engine')):
+            if engine is not None:
+                engine.dispose(close=False)
+
+@app.after_request
+def add_query_count_header(response):
+    if app.config['QUERY_COUNT_HEADER']:
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+    return response
+
+# Seitengrößen für Keyset-Pagination
+TODO_PAGE_SIZE = 50
+NOTE_PAGE_SIZE = 50
+
+def encode_cursor(*values):
+    """Kodiert die Sortierwerte der letzten Zeile einer Seite als URL-sicheren Cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, *types):
+    """Gegenstück zu encode_cursor, prüft Anzahl und Typen der Werte.
+
+    Wirft ValueError bei ungültigem Cursor, auch wenn er zwar dekodierbar ist,
+    aber nicht die erwartete Form hat (z.B. von Hand gebaut).
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError):
+        raise ValueError(f'Ungültiger Cursor: {cursor}')
+    # bool ist in Python ein int, als Zahl aber nicht erlaubt
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(isinstance(value, expected) and (expected is bool or not isinstance(value, bool))
+                       for value, expected in zip(values, types))):
+        raise ValueError(f'Ungültiger Cursor: {cursor}')
+    return values
+
+def load_todo_page(group_id, cursor=None, limit=TODO_PAGE_SIZE):
+    """Lädt eine Seite Haupttodos einer Gruppe inkl. Sub-Todos mit fester Anzahl an Queries.
+
+    Sortierung: offen vor erledigt, Priorität, neueste zuerst (id als Tie-Breaker).
+    Gibt (todos, next_cursor) zurück, next_cursor ist None auf der letzten Seite.
+    """
+    query = Todo.query.filter_by(group_id=group_id, parent_id=None)
+
+    if cursor:
+        completed, rank, created_at, todo_id = decode_cursor(cursor, bool, int, str, int)
+        created_at = datetime.fromisoformat(created_at)
+        same_status = Todo.completed.is_(completed)
+        same_rank = and_(same_status, Todo.priority_rank == rank)
+        conditions = [
+            and_(same_status, Todo.priority_rank > rank),
+            and_(same_rank, Todo.created_at < created_at),
+            and_(same_rank, Todo.created_at == created_at, Todo.id < todo_id)
+        ]
+        if not completed:
+            # Nach den offenen Todos folgen alle erledigten
+            conditions.append(Todo.completed.is_(True))
+        query = query.filter(or_(*conditions))
+
+    todos = query.options(selectinload(Todo.sub_todos)).order_by(
+        Todo.completed,
+        Todo.priority_rank,
+        Todo.created_at.desc(),
+        Todo.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        last = todos[-1]
+        next_cursor = encode_cursor(bool(last.completed), last.priority_rank,
+                                    last.created_at.isoformat(), last.id)
+    return todos, next_cursor
+
+def load_note_page(user_id, cursor=None, limit=NOTE_PAGE_SIZE):
+    """Lädt eine Seite Notizen eines Users (ohne Inhalt), zuletzt bearbeitete zuerst."""
+    query = Note.query.filter_by(user_id=user_id).options(defer(Note.content))
+
+    if cursor:
+        updated_at, note_id = decode_cursor(cursor, str, int)
+        updated_at = datetime.fromisoformat(updated_at)
+        query = query.filter(or_(
+            Note.updated_at < updated_at,
+            and_(Note.updated_at == updated_at, Note.id < note_id)
+        ))
+
+    notes = query.order_by(Note.updated_at.desc(), Note.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(notes) > limit:
+        notes = notes[:limit]
+        last = notes[-1]
+        next_cursor = encode_cursor(last.updated_at.isoformat(), last.id)
+    return notes, next_cursor
+
+def load_note_changes(user_id, since):
+    """Seit data_version `since` geänderte Notizen (ohne Inhalt) und gelöschte Notiz-IDs."""
+    changed = Note.query.filter(
+        Note.user_id == user_id,
+        Note.change_seq > since
+    ).options(defer(Note.content)).order_by(Note.change_seq).all()
+
+    deleted = [note_id for note_id, in db.session.query(NoteTombstone.note_id).filter(
+        NoteTombstone.user_id == user_id,
+        NoteTombstone.change_seq > since
+    )]
+    return changed, deleted
+
+def prune_note_tombstones(user):
+    """Entfernt Tombstones älter als NOTE_TOMBSTONE_RETENTION und hebt den Sync-Floor des Users an.
+
+    Muss nach bump_data_version laufen: die User-Zeile ist dann bis zum Commit gesperrt.
+    """
+    expired = (NoteTombstone.user_id == user.id,
+               NoteTombstone.deleted_at < datetime.utcnow() - NOTE_TOMBSTONE_RETENTION)
+    floor = db.session.query(func.max(NoteTombstone.change_seq)).filter(*expired).scalar()
+    if floor is None:
+        return
+    NoteTombstone.query.filter(*expired).delete(synchronize_session=False)
+    user.notes_sync_floor = max(user.notes_sync_floor or 0, floor)
+
+def write_note_autosaves(entries):
+    """Schreibt gepufferte Autosaves ({(user_id, note_id): Werte}) in einer Transaktion
+
+    Die Revision kommt aus dem Puffer. Ist die Notiz inzwischen direkt gespeichert
+    worden (höhere Revision in der Datenbank), bleibt der Autosave liegen.
+    """
+    with app.app_context():
+        note_ids = [note_id for _, note_id in entries]
+        user_ids = {user_id for user_id, _ in entries}
+        notes = {row.id: row for row in db.session.query(Note.id, Note.user_id, Note.revision).filter(Note.id.in_(note_ids))}
+        users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))}
+
+        for (user_id, note_id), entry in entries.items():
+            note = notes.get(note_id)
+            if note is None or note.user_id != user_id:
+                continue  # inzwischen gelöscht
+            if (note.revision or 0) > entry['revision']:
+                continue  # inzwischen direkt gespeichert, die Revision ist schon weiter
+            # Bedingung in SQL, falls zwischen Lesen und Schreiben direkt gespeichert wird
+            db.session.execute(
+                update(Note)
+                .where(Note.id == note_id, Note.revision <= entry['revision'])
+                .values(
+                    title=entry['title'],
+                    content=entry['content'],
+                    updated_at=entry['saved_at'],
+                    revision=entry['revision'],
+                    change_seq=bump_data_version(users[user_id])
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        db.session.commit()
+
+# Autosaves derselben Notiz werden zusammengefasst und einmal pro Intervall geschrieben.
+# Der Puffer liegt in einem gemeinsamen Verzeichnis, damit jeder gunicorn-Worker den
+# noch nicht geschriebenen Stand sieht (alle Worker müssen auf demselben Host laufen).
+note_autosave_buffer = SharedWriteBehindBuffer(
+    write_note_autosaves,
+    os.getenv('NOTE_AUTOSAVE_DIR', os.path.join(app.instance_path, 'autosave')),
+    interval=float(os.getenv('NOTE_AUTOSAVE_INTERVAL', '2'))
+)
+
+class StaleRevision(Exception):
+    """base_revision passt nicht zum aktuellen Stand der Notiz"""
+
+    def __init__(self, revision):
+        super().__init__(revision)
+        self.revision = revision
+
+def buffer_note_autosave(user_id, note_id, change, base_revision=None):
+    """Legt eine Änderung der Notiz in den Puffer und liefert die sofortige Bestätigung
+
+    change(title, content) liefert den neuen (title, content). Die Revision wird
+    im Puffer hochgezählt (Compare-and-Set unter dem Puffer-Lock, Startwert aus
+    Note.revision), in die Datenbank schreibt erst der Flush. Mit base_revision
+    wird nur gepuffert, wenn der aktuelle Stand diese Revision hat, sonst
+    StaleRevision. Ohne base_revision wird der Inhalt nicht aus der Datenbank gelesen.
+    """
+    saved_at = datetime.utcnow()
+
+    def apply(pending):
+        if pending:
+            title, content, revision = pending['title'], pending['content'], pending['revision']
+        elif base_revision is None:
+            title = content = None
+            revision, = db.session.query(Note.revision).filter_by(id=note_id, user_id=user_id).first_or_404()
+        else:
+            title, content, revision = db.session.query(
+                Note.title, Note.content, Note.revision
+            ).filter_by(id=note_id, user_id=user_id).first_or_404()
+            content = content or ''
+        revision = revision or 0
+        if base_revision is not None and base_revision != revision:
+            raise StaleRevision(revision)
+        title, content = change(title, content)
+        return {'title': title, 'content': content, 'revision': revision + 1, 'saved_at': saved_at}
+
+    entry = note_autosave_buffer.update((user_id, note_id), apply)
+    return {
+        'id': note_id,
+        'title': entry['title'],
+        'preview': entry['content'][:NOTE_PREVIEW_LENGTH],
+        'revision': entry['revision'],
+        'updated_at': saved_at.isoformat(),
+        'seq': entry['seq'],
+        'buffered': True
+    }
+
+def serialize_note(note, with_content=False):
+    data = {
+        'id': note.id,
+        'title': note.title,
+        'preview': note.preview or '',
+        'revision': note.revision or 0,
+        'created_at': note.created_at.isoformat(),
+        'updated_at': note.updated_at.isoformat()
+    }
+    if with_content:
+        data['content'] = note.content
+    return data
+
+# Maximale Anzahl Todos pro Deadline-Kategorie auf /deadlines
+DEADLINE_BUCKET_LIMIT = 50
+
+def deadline_bucket_filters(now=None):
+    """SQL-Bedingungen je Kategorie, entsprechen Todo.deadline_category."""
+    today = (now or datetime.utcnow()).date()
+    today_start = datetime(today.year, today.month, today.day)
+    tomorrow_start = today_start + timedelta(days=1)
+    next_week_start = today_start + timedelta(days=7)
+
+    return {
+        'today': and_(Todo.due_date >= today_start, Todo.due_date < tomorrow_start),
+        # Überfällige Todos landen wie bisher bei "upcoming"
+        'upcoming': or_(
+            Todo.due_date < today_start,
+            and_(Todo.due_date >= tomorrow_start, Todo.due_date < next_week_start)
+        ),
+        'someday': or_(Todo.due_date.is_(None), Todo.due_date >= next_week_start)
+    }
+
+def open_user_todos(user_id):
+    """Nicht erledigte Haupttodos eines Users inkl. Gruppe (ein JOIN statt Lazy-Load pro Todo)."""
+    return Todo.query.join(Todo.group).options(contains_eager(Todo.group)).filter(
+        TaskGroup.user_id == user_id,
+        Todo.completed == False,  # noqa: E712
+        Todo.parent_id.is_(None)
+    )
+
+# Quadranten der Prioritätsmatrix je priority_rank
+MATRIX_QUADRANTS = {
+    PRIORITY_RANKS['urgent']: 'urgent_important',   # Dringend & Wichtig
+    PRIORITY_RANKS['high']: 'important',            # Wichtig
+    PRIORITY_RANKS['medium']: 'urgent',             # Dringend
+    PRIORITY_RANKS['low']: 'neither'                # Weder noch
+}
+MATRIX_QUADRANT_LIMIT = 20
+
+def load_priority_matrix(user_id, limit=MATRIX_QUADRANT_LIMIT):
+    """Top-N Todos und Gesamtanzahl je Quadrant in einer einzigen Query (Window-Funktionen)."""
+    ranked = open_user_todos(user_id).with_entities(
+        Todo.id.label('todo_id'),
+        func.row_number().over(partition_by=Todo.priority_rank, order_by=Todo.id).label('position'),
+        func.count().over(partition_by=Todo.priority_rank).label('quadrant_count')
+    ).subquery()
+
+    rows = db.session.query(Todo, ranked.c.quadrant_count).join(
+        ranked, Todo.id == ranked.c.todo_id
+    ).join(Todo.group).options(contains_eager(Todo.group)).filter(
+        ranked.c.position <= limit
+    ).order_by(Todo.priority_rank, ranked.c.position).all()
+
+    matrix = {quadrant: [] for quadrant in MATRIX_QUADRANTS.values()}
+    counts = {quadrant: 0 for quadrant in MATRIX_QUADRANTS.values()}
+    for todo, quadrant_count in rows:
+        quadrant = MATRIX_QUADRANTS.get(todo.priority_rank, 'neither')
+        matrix[quadrant].append(todo)
+        counts[quadrant] = quadrant_count
+    return matrix, counts
 
 # Hilfsfunktionen für Authentifizierung
 def login_required(f):
@@ -111,15 +501,91 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def is_xhr():
+    # Fetch-Aufrufe der Templates setzen diesen Header und bekommen JSON statt Redirect
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+def conditional_get(f):
+    """ETag aus der data_version des Users, beantwortet If-None-Match mit 304 (nur GET)"""
+    from functools import wraps
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = get_current_user()
+        if request.method != 'GET' or not user:
+            return f(*args, **kwargs)
+
+        # Datum gehört dazu, weil sich z.B. die Deadline-Kategorien täglich ändern
+        fingerprint = '|'.join([
+            app.config['ETAG_VERSION'],
+            str(user.id),
+            str(user.data_version or 0),
+            datetime.utcnow().date().isoformat(),
+            request.full_path
+        ])
+        etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(f(*args, **kwargs))
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+def increment_user_counter(user, column):
+    """Erhöht einen Zähler des Users in SQL (column + 1) und gibt den neuen Wert zurück.
+
+    Kein Lesen und Zurückschreiben in Python: zwei Worker, die gleichzeitig
+    schreiben, bekommen verschiedene Werte, und ein aus einem älteren Snapshot
+    (Lese-Engine) geladener User kann den Zähler nicht zurücksetzen. Der neue
+    Wert kommt aus derselben Schreib-Transaktion (RETURNING bzw. erneutes Lesen).
+    """
+    statement = update(User).where(User.id == user.id).values({column: column + 1}).execution_options(
+        synchronize_session=False
+    )
+    if db.engine.dialect.update_returning:
+        value = db.session.execute(statement.returning(column)).scalar_one()
+    else:
+        db.session.execute(statement)
+        value = db.session.query(column).filter(User.id == user.id).scalar()
+    # Ins geladene Objekt übernehmen, ohne es als geändert zu markieren
+    set_committed_value(user, column.key, value)
+    return value
+
+def bump_data_version(user):
+    """Invalidiert alle ETags des Users, bei jeder schreibenden Route aufrufen.
+
+    Gibt die neue data_version zurück (Sequenznummer für den Delta-Sync der Notizen).
+    """
+    return increment_user_counter(user, User.data_version)
+
+def get_user_todo_or_404(todo_id, user):
+    # Todo nur laden, wenn es in einer Gruppe des Users liegt
+    return Todo.query.join(Todo.group).filter(
+        Todo.id == todo_id,
+        TaskGroup.user_id == user.id
+    ).first_or_404()
+
 def get_current_user():
-    if 'user' in session:
-        user_id = session['user']['id']
-        user_email = session['user']['email']
-        user = User.query.get(user_id)
-        if user:
-            print(f"👤 Current User: {user.email} (ID: {user.id}) - Session: {user_email}")
-        return user
-    return None
+    # Einmal pro Request laden und in flask.g zwischenspeichern
+    if 'current_user' not in g:
+        user = None
+        if 'user' in session:
+            user_id = session['user']['id']
+            user_email = session['user']['email']
+            user = db.session.get(User, user_id)
+            if user:
+                log.debug('Current User geladen', extra={'event': 'current_user', 'user_id': user.id, 'session_email': user_email})
+        g.current_user = user
+    return g.current_user
+
+def get_user_groups():
+    # Gruppen des aktuellen Users, geteilt von Routes, Context-Processor und Templates
+    if 'user_groups' not in g:
+        user = get_current_user()
+        g.user_groups = TaskGroup.query.filter_by(user_id=user.id).all() if user else []
+    return g.user_groups
 
 # Authentication Routes
 @app.route('/login')
@@ -132,21 +598,23 @@ def login():
 @app.route('/auth/google')
 def google_login():
     redirect_uri = url_for('auth_callback', _external=True)
+    google_metadata.ensure_fresh()
     return google.authorize_redirect(redirect_uri)
 
 @app.route('/auth/callback')
 def auth_callback():
+    google_metadata.ensure_fresh()
     token = google.authorize_access_token()
     user_info = token.get('userinfo')
     
     if user_info:
-        print(f"🔍 OAuth Callback - User Info: {user_info['email']} (ID: {user_info['sub']})")
+        log.info('OAuth Callback', extra={'event': 'oauth_callback', 'email': user_info['email'], 'google_id': user_info['sub']})
         
         # User in Datenbank suchen oder erstellen
         user = User.query.filter_by(google_id=user_info['sub']).first()
         
         if not user:
-            print(f"✅ Neuen User erstellen: {user_info['email']}")
+            log.info('Neuen User erstellen', extra={'event': 'user_created', 'email': user_info['email']})
             # Neuen User erstellen
             user = User(
                 google_id=user_info['sub'],
@@ -155,20 +623,21 @@ def auth_callback():
                 picture=user_info.get('picture', '')
             )
             db.session.add(user)
-            db.session.commit()
+            db.session.flush()  # Um die ID des Users zu erhalten
             
-            # Standard-Gruppen für neuen User erstellen
+            # Standard-Gruppen für neuen User erstellen (ein INSERT, eine Transaktion mit dem User)
             default_groups = ['Arbeit', 'Privat', 'Einkaufen']
-            for group_name in default_groups:
-                group = TaskGroup(name=group_name, user_id=user.id)
-                db.session.add(group)
+            bulk_insert(db.session, TaskGroup, [
+                {'name': group_name, 'user_id': user.id} for group_name in default_groups
+            ])
             db.session.commit()
         else:
-            print(f"🔄 Bestehenden User aktualisieren: {user_info['email']} (DB ID: {user.id})")
+            log.info('Bestehenden User aktualisieren', extra={'event': 'user_updated', 'email': user_info['email'], 'user_id': user.id})
             # Letzten Login aktualisieren
             user.last_login = datetime.utcnow()
             user.name = user_info['name']  # Name aktualisieren falls geändert
             user.picture = user_info.get('picture', '')
+            bump_data_version(user)  # Name/Bild erscheinen auf jeder Seite
             db.session.commit()
         
         # Session komplett leeren und neu setzen
@@ -180,59 +649,114 @@ def auth_callback():
             'picture': user.picture or ''
         }
         
-        print(f"💾 Session gesetzt für User ID: {user.id} ({user.email})")
+        log.info('Session gesetzt', extra={'event': 'session_set', 'user_id': user.id, 'email': user.email})
         
         return redirect(url_for('index'))
     
-    print("❌ Kein user_info erhalten")
+    log.warning('Kein user_info erhalten', extra={'event': 'oauth_no_userinfo'})
     return redirect(url_for('login'))
 
 @app.route('/logout')
 def logout():
     if 'user' in session:
-        print(f"🚪 User logout: {session['user']['email']}")
+        log.info('User logout', extra={'event': 'logout', 'email': session['user']['email']})
     session.clear()  # Komplette Session leeren
     return redirect(url_for('login'))
 
+class FragmentCache:
+    """Prozesslokaler LRU-Cache für gerenderte Template-Fragmente"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+group_nav_cache = FragmentCache()
+
+def bump_groups_version(user):
+    # Invalidiert die gecachte Gruppen-Navigation des Users (in allen Workern),
+    # atomar in SQL wie data_version, sonst bleibt der Cache-Schlüssel bei parallelen Änderungen gleich
+    increment_user_counter(user, User.groups_version)
+    bump_data_version(user)
+
+def render_group_nav(selected_group=None):
+    """Gruppen-Navigation aus dem Cache, nur bei geänderter groups_version neu rendern"""
+    user = get_current_user()
+    if not user:
+        return Markup('')
+
+    key = (user.id, user.groups_version or 0, selected_group.id if selected_group else None)
+    html = group_nav_cache.get(key)
+    if html is None:
+        html = Markup(app.jinja_env.get_template('_group_nav.html').render(
+            groups=get_user_groups(),
+            selected_group=selected_group
+        ))
+        group_nav_cache.set(key, html)
+    return html
+
 # Template-Funktion für globale Gruppen (nur für eingeloggte User)
 @app.context_processor
 def inject_groups():
-    user = get_current_user()
-    if user:
-        groups = TaskGroup.query.filter_by(user_id=user.id).all()
-        return dict(groups=groups, current_user=user)
-    return dict(groups=[], current_user=None)
+    # groups wird erst beim Zugriff geladen, die Navigation kommt aus dem Fragment-Cache
+    return dict(groups=LocalProxy(get_user_groups), current_user=get_current_user(),
+                group_nav=render_group_nav)
 
 @app.route('/')
 @login_required
+@conditional_get
 def index():
     user = get_current_user()
-    groups = TaskGroup.query.filter_by(user_id=user.id).all()
+    groups = get_user_groups()
     selected_group_id = request.args.get('group_id', type=int)
     selected_group = None
     todos_by_group = {}
+    next_cursor = None
     
     # Wenn keine Gruppe ausgewählt ist, nehmen wir die erste
     if not selected_group_id and groups:
         selected_group_id = groups[0].id
     
     if selected_group_id:
-        selected_group = TaskGroup.query.filter_by(id=selected_group_id, user_id=user.id).first_or_404()
-        todos = Todo.query.filter_by(group_id=selected_group_id, parent_id=None).order_by(
-            Todo.completed,
-            case(
-                (Todo.priority == 'urgent', 1),
-                (Todo.priority == 'high', 2),
-                (Todo.priority == 'medium', 3),
-                (Todo.priority == 'low', 4)
-            ),
-            Todo.created_at.desc()
-        ).all()
-        todos_by_group[selected_group_id] = todos
+        # Ausgewählte Gruppe aus dem bereits geladenen Gruppen-Cache nehmen
+        selected_group = next((group for group in groups if group.id == selected_group_id), None)
+        if selected_group is None:
+            abort(404)
+        # Erste Seite Haupttodos + Sub-Todos, der Rest wird per Infinite Scroll nachgeladen
+        todos_by_group[selected_group_id], next_cursor = load_todo_page(selected_group_id)
     
     return render_template('index.html', 
                          selected_group=selected_group,
-                         todos_by_group=todos_by_group)
+                         todos_by_group=todos_by_group,
+                         next_cursor=next_cursor)
+
+@app.route('/api/groups/<int:group_id>/todos')
+@login_required
+def api_group_todos(group_id):
+    user = get_current_user()
+    TaskGroup.query.filter_by(id=group_id, user_id=user.id).first_or_404()
+    try:
+        todos, next_cursor = load_todo_page(group_id, request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+    return jsonify({
+        'html': render_template('_todo_items.html', todos=todos),
+        'next_cursor': next_cursor
+    })
 
 @app.route('/group/new', methods=['GET', 'POST'])
 @login_required
@@ -243,6 +767,7 @@ def new_group():
         if name:
             group = TaskGroup(name=name, user_id=user.id)
             db.session.add(group)
+            bump_groups_version(user)
             db.session.commit()
             return redirect(url_for('index'))
     return render_template('group_form.html')
@@ -256,6 +781,7 @@ def edit_group(id):
         name = request.form.get('name')
         if name:
             group.name = name
+            bump_groups_version(user)
             db.session.commit()
             return redirect(url_for('index'))
     return render_template('group_form.html', group=group)
@@ -266,6 +792,7 @@ def delete_group(id):
     user = get_current_user()
     group = TaskGroup.query.filter_by(id=id, user_id=user.id).first_or_404()
     db.session.delete(group)
+    bump_groups_version(user)
     db.session.commit()
     return redirect(url_for('index'))
 
@@ -277,7 +804,7 @@ def new_todo():
     group_id = request.args.get('group_id')
     parent_todo = None
     if parent_id:
-        parent_todo = Todo.query.get_or_404(parent_id)
+        parent_todo = get_user_todo_or_404(parent_id, user)
         group_id = parent_todo.group_id
 
     if request.method == 'POST':
@@ -308,33 +835,88 @@ def new_todo():
             db.session.add(todo)
             db.session.flush()  # Um die ID des Haupttodos zu erhalten
             
-            # Sub-Todos hinzufügen
+            # Sub-Todos hinzufügen (ein mehrzeiliges INSERT)
             if not parent_id:  # Nur für Haupttodos
                 sub_todo_titles = request.form.getlist('sub_todo_title[]')
-                
-                for title in sub_todo_titles:
-                    if title.strip():  # Nur Sub-Todos mit Titel hinzufügen
-                        sub_todo = Todo(
-                            title=title,
-                            description=None,  # Keine Beschreibung für Sub-Todos
-                            group_id=group_id,
-                            parent_id=todo.id,
-                            priority=priority
-                        )
-                        db.session.add(sub_todo)
+                bulk_insert(db.session, Todo, [
+                    sub_todo_row(todo, title) for title in sub_todo_titles
+                    if title.strip()  # Nur Sub-Todos mit Titel hinzufügen
+                ])
             
+            bump_data_version(user)
             db.session.commit()
+            if is_xhr():
+                # Nur die neue Zeile rendern, die Liste wird im Browser ergänzt
+                return jsonify({
+                    'success': True,
+                    'todo': serialize_todo(todo),
+                    'html': render_template('_todo_items.html', todos=[todo]) if not parent_id else None
+                }), 201
             return redirect(url_for('index', group_id=group_id))
+        if is_xhr():
+            return jsonify({'success': False, 'error': 'Titel und Gruppe sind erforderlich'}), 400
     return render_template('todo_form.html', 
                          selected_group_id=group_id, parent_todo=parent_todo)
 
+def sub_todo_row(todo, title):
+    """Spaltenwerte eines neuen Sub-Todos für bulk_insert"""
+    return {
+        'title': title.strip(),
+        'description': None,  # Keine Beschreibung für Sub-Todos
+        'group_id': todo.group_id,
+        'parent_id': todo.id,
+        'priority': todo.priority,
+        'priority_rank': todo.priority_rank  # bulk_insert umgeht @validates
+    }
+
+def sync_sub_todos(todo, sub_todo_ids, sub_todo_titles):
+    """Gleicht die Sub-Todos mit dem Formular ab: nur geänderte Zeilen werden geschrieben"""
+    # Nur (id, title, group_id, priority) laden, keine ORM-Objekte
+    existing = {row.id: row for row in db.session.query(
+        Todo.id, Todo.title, Todo.group_id, Todo.priority
+    ).filter(Todo.parent_id == todo.id)}
+    inserts, updates, kept = [], [], set()
+    for index, title in enumerate(sub_todo_titles):
+        title = title.strip()
+        if not title:  # Leere Sub-Todos werden entfernt bzw. nicht angelegt
+            continue
+        raw_id = sub_todo_ids[index] if index < len(sub_todo_ids) else ''
+        sub_todo_id = int(raw_id) if raw_id.isdigit() else None
+        row = existing.get(sub_todo_id)
+        if row is None or sub_todo_id in kept:
+            # Neue oder fremde IDs werden als neues Sub-Todo angelegt
+            inserts.append(sub_todo_row(todo, title))
+            continue
+        kept.add(sub_todo_id)
+        # Sub-Todos übernehmen Gruppe und Priorität des Haupttodos, Erledigt-Status bleibt erhalten
+        if row.title != title or str(row.group_id) != str(todo.group_id) or row.priority != todo.priority:
+            updates.append({
+                'id': sub_todo_id,
+                'title': title,
+                'group_id': todo.group_id,
+                'priority': todo.priority,
+                'priority_rank': todo.priority_rank
+            })
+
+    removed = set(existing) - kept
+    # Bulk-Statements umgehen @validates, daher priority_rank explizit setzen
+    if removed:
+        Todo.query.filter(Todo.id.in_(removed)).delete(synchronize_session=False)
+    if updates:
+        db.session.execute(update(Todo), updates)
+    bulk_insert(db.session, Todo, inserts)
+    return len(inserts), len(updates), len(removed)
+
 @app.route('/todo/<int:id>/edit', methods=['GET', 'POST'])
+@login_required
 def edit_todo(id):
-    todo = Todo.query.get_or_404(id)
-    groups = TaskGroup.query.all()
+    user = get_current_user()
+    todo = get_user_todo_or_404(id, user)
+    groups = get_user_groups()
     
     if request.method == 'POST':
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        bump_data_version(user)
+        if is_xhr():
             todo.title = request.form.get('title')
             todo.description = request.form.get('description')
             db.session.commit()
@@ -357,22 +939,19 @@ def edit_todo(id):
             else:
                 todo.due_date = None
             
-            # Bestehende Sub-Todos löschen
-            Todo.query.filter_by(parent_id=todo.id).delete()
-            
-            # Neue Sub-Todos hinzufügen
-            sub_todo_titles = request.form.getlist('sub_todo_title[]')
-            
-            for title in sub_todo_titles:
-                if title.strip():  # Nur Sub-Todos mit Titel hinzufügen
-                    sub_todo = Todo(
-                        title=title,
-                        description=None,  # Keine Beschreibung für Sub-Todos
-                        group_id=todo.group_id,
-                        parent_id=todo.id,
-                        priority=todo.priority
-                    )
-                    db.session.add(sub_todo)
+            # Sub-Todos abgleichen statt löschen und neu anlegen
+            inserted, updated, removed = sync_sub_todos(
+                todo,
+                request.form.getlist('sub_todo_id[]'),
+                request.form.getlist('sub_todo_title[]')
+            )
+            log.debug('Sub-Todos abgeglichen', extra={
+                'event': 'sub_todos_synced',
+                'todo_id': todo.id,
+                'inserted': inserted,
+                'updated': updated,
+                'removed': removed
+            })
             
             db.session.commit()
             return redirect(url_for('index', group_id=todo.group_id))
@@ -380,120 +959,443 @@ def edit_todo(id):
     return render_template('todo_form.html', todo=todo, groups=groups)
 
 @app.route('/todo/<int:id>/toggle')
+@login_required
 def toggle_todo(id):
-    todo = Todo.query.get_or_404(id)
+    user = get_current_user()
+    todo = get_user_todo_or_404(id, user)
     todo.completed = not todo.completed
+    bump_data_version(user)
     db.session.commit()
+    if is_xhr():
+        return jsonify({'success': True, 'todo': serialize_todo(todo)})
     return redirect(url_for('index', group_id=todo.group_id))
 
 @app.route('/todo/<int:id>/delete')
+@login_required
 def delete_todo(id):
-    todo = Todo.query.get_or_404(id)
+    user = get_current_user()
+    todo = get_user_todo_or_404(id, user)
     group_id = todo.group_id  # Gruppe vor dem Löschen speichern
     db.session.delete(todo)
+    bump_data_version(user)
     db.session.commit()
+    if is_xhr():
+        return jsonify({'success': True, 'id': id})
     return redirect(url_for('index', group_id=group_id))
 
+# Obergrenze pro Batch-Request
+MAX_BATCH_OPERATIONS = 200
+
+class BatchError(Exception):
+    pass
+
+def serialize_todo(todo):
+    return {
+        'id': todo.id,
+        'title': todo.title,
+        'description': todo.description,
+        'completed': bool(todo.completed),
+        'priority': todo.priority,
+        'due_date': todo.due_date.strftime('%Y-%m-%dT%H:%M') if todo.due_date else None,
+        'group_id': todo.group_id,
+        'parent_id': todo.parent_id
+    }
+
+def parse_due_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M')
+    except (TypeError, ValueError):
+        raise BatchError(f'Ungültiges Datum: {value}')
+
+def validate_todo_fields(operation):
+    """Prüft Typ und Wertebereich der Felder einer Batch-Operation, bevor sie gesetzt werden"""
+    if 'title' in operation and (not isinstance(operation['title'], str) or not operation['title'].strip()):
+        raise BatchError('Titel fehlt')
+    if 'title' in operation and len(operation['title']) > Todo.title.type.length:
+        raise BatchError(f'Titel länger als {Todo.title.type.length} Zeichen')
+    if operation.get('description') is not None and not isinstance(operation['description'], str):
+        raise BatchError('Beschreibung muss ein Text sein')
+    if 'priority' in operation and operation['priority'] not in PRIORITY_RANKS:
+        raise BatchError(f'Ungültige Priorität: {operation["priority"]}')
+    if 'completed' in operation and not isinstance(operation['completed'], bool):
+        raise BatchError('completed muss true oder false sein')
+
+def operation_id(operation, key):
+    """Ganzzahlige ID aus einer Batch-Operation, sonst None (auch für Listen, Objekte, Bool)"""
+    value = operation.get(key)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def apply_todo_operation(operation, todos, group_ids):
+    """Führt eine Batch-Operation aus und gibt das betroffene Todo zurück"""
+    op = operation.get('op')
+
+    if op == 'create':
+        group_id = operation_id(operation, 'group_id')
+        parent = todos.get(operation_id(operation, 'parent_id')) if operation.get('parent_id') else None
+        if operation.get('parent_id') and parent is None:
+            raise BatchError('Eltern-Todo nicht gefunden')
+        priority = operation.get('priority', 'medium')
+        if parent:
+            # Sub-Todos übernehmen Gruppe und Priorität des Eltern-Todos
+            group_id, priority = parent.group_id, parent.priority
+        if group_id not in group_ids:
+            raise BatchError('Gruppe nicht gefunden')
+        if 'title' not in operation:
+            raise BatchError('Titel fehlt')
+        validate_todo_fields(operation)
+        todo = Todo(
+            title=operation['title'],
+            description=operation.get('description'),
+            group_id=group_id,
+            parent_id=parent.id if parent else None,
+            priority=priority,
+            due_date=parse_due_date(operation.get('due_date'))
+        )
+        db.session.add(todo)
+        return todo
+
+    todo = todos.get(operation_id(operation, 'id'))
+    if todo is None or todo in db.session.deleted:
+        raise BatchError('Todo nicht gefunden')
+
+    if op == 'toggle':
+        todo.completed = not todo.completed
+    elif op == 'update':
+        validate_todo_fields(operation)
+        # Wie die Gruppe folgt die Priorität von Sub-Todos dem Eltern-Todo
+        if 'priority' in operation and todo.parent_id is not None:
+            raise BatchError('Die Priorität von Sub-Todos kann nicht einzeln geändert werden')
+        for field in ('title', 'description', 'priority', 'completed'):
+            if field in operation:
+                setattr(todo, field, operation[field])
+        if 'priority' in operation:
+            # priority_rank setzt Todo.validate_priority
+            for sub_todo in todo.sub_todos:
+                sub_todo.priority = todo.priority
+        if 'due_date' in operation:
+            todo.due_date = parse_due_date(operation['due_date'])
+    elif op == 'move':
+        if operation_id(operation, 'group_id') not in group_ids:
+            raise BatchError('Gruppe nicht gefunden')
+        # Sub-Todos gehören zur Gruppe ihres Eltern-Todos, verschoben wird nur das Eltern-Todo
+        if todo.parent_id is not None:
+            raise BatchError('Sub-Todos können nicht einzeln verschoben werden')
+        todo.group_id = operation['group_id']
+        # Sub-Todos wandern mit
+        for sub_todo in todo.sub_todos:
+            sub_todo.group_id = todo.group_id
+    elif op == 'delete':
+        db.session.delete(todo)
+    else:
+        raise BatchError(f'Unbekannte Operation: {op}')
+    return todo
+
+@app.route('/api/todos/batch', methods=['POST'])
+@login_required
+def api_todos_batch():
+    """Mehrere Todo-Operationen (create/update/toggle/delete/move) in einer Transaktion"""
+    user = get_current_user()
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations fehlt'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'Maximal {MAX_BATCH_OPERATIONS} Operationen pro Request'}), 400
+
+    # Alle referenzierten Todos des Users mit einer Query vorladen
+    todo_ids = {value for operation in operations if isinstance(operation, dict)
+                for value in (operation_id(operation, 'id'), operation_id(operation, 'parent_id')) if value}
+    todos = {todo.id: todo for todo in Todo.query.join(Todo.group).options(
+        selectinload(Todo.sub_todos)
+    ).filter(Todo.id.in_(todo_ids), TaskGroup.user_id == user.id)} if todo_ids else {}
+    group_ids = {group.id for group in get_user_groups()}
+
+    applied = []
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise BatchError('Operation muss ein Objekt sein')
+            applied.append((operation, apply_todo_operation(operation, todos, group_ids)))
+        except BatchError as e:
+            # Alles oder nichts: bei einem Fehler wird keine Operation gespeichert
+            db.session.rollback()
+            return jsonify({
+                'error': str(e),
+                'index': index,
+                'results': [{'index': i, 'status': 'rolled_back' if i < index else ('error' if i == index else 'skipped')}
+                            for i in range(len(operations))]
+            }), 422
+
+    bump_data_version(user)
+    db.session.flush()  # IDs neuer Todos vergeben
+    results = [{
+        'index': index,
+        'op': operation['op'],
+        'status': 'ok',
+        'id': todo.id,
+        'todo': None if operation['op'] == 'delete' else serialize_todo(todo)
+    } for index, (operation, todo) in enumerate(applied)]
+    db.session.commit()
+    return jsonify({'results': results})
+
 @app.route('/deadlines')
+@login_required
+@conditional_get
 def deadlines():
-    # Alle nicht erledigten Haupttodos nach Deadline kategorisieren
-    todos = Todo.query.filter_by(completed=False, parent_id=None).all()
-    
+    user = get_current_user()
+    bucket_filters = deadline_bucket_filters()
+
+    # Anzahl pro Kategorie in einer Aggregat-Query
+    counts = open_user_todos(user.id).with_entities(*[
+        func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+        for condition in bucket_filters.values()
+    ]).one()
+    category_counts = dict(zip(bucket_filters.keys(), counts))
+
+    # Pro Kategorie nur die wichtigsten Todos laden, bereits nach Priorität sortiert
     categories = {
-        'today': [],
-        'upcoming': [],
-        'someday': []
+        category: open_user_todos(user.id).filter(condition).order_by(
+            Todo.priority_rank,
+            Todo.due_date,
+            Todo.id
+        ).limit(DEADLINE_BUCKET_LIMIT).all() if category_counts[category] else []
+        for category, condition in bucket_filters.items()
     }
     
-    for todo in todos:
-        category = todo.deadline_category
-        categories[category].append(todo)
-    
-    # Sortiere innerhalb jeder Kategorie nach Priorität
-    for category in categories:
-        categories[category].sort(key=lambda x: (
-            x.priority == 'urgent',
-            x.priority == 'high',
-            x.priority == 'medium',
-            x.priority == 'low'
-        ), reverse=True)
-    
-    return render_template('deadlines.html', categories=categories)
+    return render_template('deadlines.html', categories=categories, category_counts=category_counts)
 
 @app.route('/notes')
+@login_required
 def notes():
     return render_template('notes.html')
 
 @app.route('/api/notes', methods=['GET', 'POST'])
+@login_required
+@conditional_get
 def api_notes():
+    user = get_current_user()
     if request.method == 'GET':
-        # Notizen aus der Datenbank laden
-        notes = Note.query.order_by(Note.updated_at.desc()).all()
-        return jsonify([{
-            'id': note.id,
-            'title': note.title,
-            'content': note.content,
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat()
-        } for note in notes])
+        # Delta-Sync: nur Änderungen und Löschungen seit dem Cursor
+        if 'since' in request.args:
+            since = request.args.get('since', type=int)
+            if since is None:
+                abort(400)
+            if since < (user.notes_sync_floor or 0):
+                # Tombstones seit dem Cursor sind schon entfernt, Löschungen wären unvollständig
+                return jsonify({'error': 'resync_required'}), 410
+            changed, deleted = load_note_changes(user.id, since)
+            return jsonify({
+                'notes': [serialize_note(note) for note in changed],
+                'deleted': deleted,
+                'cursor': user.data_version or 0
+            })
+
+        # Eine Seite Notizen (Titel + Vorschau) laden, Cursor für die nächste Seite im X-Next-Cursor Header
+        try:
+            notes, next_cursor = load_note_page(
+                user.id,
+                request.args.get('cursor'),
+                min(max(request.args.get('limit', NOTE_PAGE_SIZE, type=int), 1), NOTE_PAGE_SIZE)
+            )
+        except ValueError:
+            abort(400)
+        response = jsonify([serialize_note(note) for note in notes])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        # Startpunkt für spätere Delta-Syncs
+        response.headers['X-Sync-Cursor'] = str(user.data_version or 0)
+        return response
     
     elif request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         
-        if 'id' in data and data['id']:
-            # Bestehende Notiz aktualisieren
-            note = Note.query.get_or_404(data['id'])
-            note.title = data.get('title', '')
-            note.content = data.get('content', '')
-            note.updated_at = datetime.utcnow()
-        else:
-            # Neue Notiz erstellen
-            note = Note(
-                title=data.get('title', ''),
-                content=data.get('content', '')
+        if data.get('autosave'):
+            # Autosave: sofort bestätigen, geschrieben wird gesammelt im Hintergrund
+            try:
+                note_id = int(data['id'])
+            except (KeyError, TypeError, ValueError):
+                abort(400)
+            saved = buffer_note_autosave(
+                user.id, note_id, lambda title, content: (data.get('title', ''), data.get('content', ''))
             )
-            db.session.add(note)
+            return jsonify(saved), 202
         
+        if 'id' in data and data['id']:
+            # Bestehende Notiz aktualisieren
+            note = Note.query.filter_by(id=data['id'], user_id=user.id).first_or_404()
+            key = (user.id, note.id)
+            # Direktes Speichern ersetzt einen noch gepufferten Autosave. Unter dem
+            # Puffer-Lock bis zum Commit, damit kein Autosave die neue Revision überholt.
+            with note_autosave_buffer.locked():
+                pending = note_autosave_buffer.get(key)
+                note_autosave_buffer.discard(key)
+                note.title = data.get('title', '')
+                note.content = data.get('content', '')
+                note.updated_at = datetime.utcnow()
+                note.revision = max(note.revision or 0, pending['revision'] if pending else 0) + 1
+                note.change_seq = bump_data_version(user)
+                db.session.commit()
+            return jsonify(serialize_note(note, with_content=True))
+
+        # Neue Notiz erstellen
+        note = Note(
+            title=data.get('title', ''),
+            content=data.get('content', ''),
+            user_id=user.id
+        )
+        db.session.add(note)
+        note.change_seq = bump_data_version(user)
         db.session.commit()
         
-        return jsonify({
-            'id': note.id,
-            'title': note.title,
-            'content': note.content,
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat()
-        })
+        return jsonify(serialize_note(note, with_content=True))
+
+@app.route('/api/notes/<int:note_id>', methods=['GET'])
+@login_required
+def api_get_note(note_id):
+    # Vollständige Notiz inkl. Inhalt, wird beim Auswählen geladen
+    user = get_current_user()
+    note = Note.query.filter_by(id=note_id, user_id=user.id).first_or_404()
+    data = serialize_note(note, with_content=True)
+
+    # Noch nicht geschriebenen Autosave berücksichtigen (auch aus anderen Workern)
+    pending = note_autosave_buffer.get((user.id, note.id))
+    if pending:
+        data.update(
+            title=pending['title'],
+            content=pending['content'],
+            preview=pending['content'][:NOTE_PREVIEW_LENGTH],
+            revision=pending['revision'],
+            updated_at=pending['saved_at'].isoformat()
+        )
+    return jsonify(data)
+
+@app.route('/api/notes/<int:note_id>', methods=['PATCH'])
+@login_required
+def api_patch_note(note_id):
+    """Delta-Save: {base_revision, title?, delta?: {start, end, text}}
+
+    Ersetzt content[start:end] (Positionen in Unicode-Zeichen) durch text.
+    Passt base_revision nicht zum aktuellen Stand, wird mit 409 abgelehnt.
+    """
+    user = get_current_user()
+    data = request.get_json(silent=True) or {}
+
+    # Ungültige base_revision passt zu keinem Stand und ergibt 409 mit der aktuellen Revision
+    base_revision = data.get('base_revision')
+    if not isinstance(base_revision, int) or isinstance(base_revision, bool):
+        base_revision = -1
+
+    delta = data.get('delta')
+    if delta:
+        try:
+            start, end, text = int(delta['start']), int(delta['end']), str(delta.get('text', ''))
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+
+    def change(title, content):
+        if delta:
+            if not 0 <= start <= end <= len(content):
+                abort(400)
+            content = content[:start] + text + content[end:]
+        if 'title' in data:
+            title = data['title']
+        return title, content
+
+    # Aktueller Stand: noch gepufferter Autosave (auch aus anderen Workern) oder Datenbank
+    try:
+        saved = buffer_note_autosave(user.id, note_id, change, base_revision)
+    except StaleRevision as stale:
+        return jsonify({'error': 'stale_base', 'revision': stale.revision}), 409
+    return jsonify(saved), 202
 
 @app.route('/api/notes/<int:note_id>', methods=['DELETE'])
+@login_required
 def api_delete_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    user = get_current_user()
+    note = Note.query.filter_by(id=note_id, user_id=user.id).first_or_404()
+    note_autosave_buffer.discard((user.id, note.id))
     db.session.delete(note)
+    db.session.add(NoteTombstone(note_id=note.id, user_id=user.id, change_seq=bump_data_version(user)))
+    prune_note_tombstones(user)
     db.session.commit()
     return jsonify({'success': True})
 
+@app.route('/search')
+@login_required
+def search_page():
+    user = get_current_user()
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_more = search(db.session, user.id, query, page)
+    return render_template('search.html', query=query, page=page, results=results, has_more=has_more)
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    user = get_current_user()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_more = search(db.session, user.id, request.args.get('q', ''), page)
+    return jsonify({
+        'results': [dict(result,
+                         snippet=str(result['snippet']),
+                         url=search_result_url(result)) for result in results],
+        'has_more': has_more
+    })
+
+def search_result_url(result):
+    if result['kind'] == 'note':
+        return url_for('notes', note=result['id'])
+    return url_for('edit_todo', id=result['id'])
+
+app.jinja_env.globals['search_result_url'] = search_result_url
+
 @app.route('/matrix')
+@login_required
+@conditional_get
 def priority_matrix():
-    # Alle nicht erledigten Haupttodos (keine Sub-Todos) nach Priorität gruppieren
-    todos = Todo.query.filter_by(completed=False, parent_id=None).all()
-    
-    matrix = {
-        'urgent_important': [],    # Dringend & Wichtig (urgent)
-        'important': [],           # Wichtig (high)
-        'urgent': [],              # Dringend (medium)
-        'neither': []              # Weder noch (low)
-    }
-    
-    for todo in todos:
-        if todo.priority == 'urgent':
-            matrix['urgent_important'].append(todo)
-        elif todo.priority == 'high':
-            matrix['important'].append(todo)
-        elif todo.priority == 'medium':
-            matrix['urgent'].append(todo)
-        else:  # low
-            matrix['neither'].append(todo)
-            
-    return render_template('priority_matrix.html', matrix=matrix)
+    # Nicht erledigte Haupttodos (keine Sub-Todos) nach Priorität gruppieren
+    user = get_current_user()
+    matrix, matrix_counts = load_priority_matrix(user.id)
+    return render_template('priority_matrix.html', matrix=matrix, matrix_counts=matrix_counts)
+
+@app.route('/api/matrix/<quadrant>')
+@login_required
+def api_matrix_quadrant(quadrant):
+    # "Mehr anzeigen" für einen Quadranten, Keyset über die Todo-ID
+    ranks = [rank for rank, name in MATRIX_QUADRANTS.items() if name == quadrant]
+    if not ranks:
+        abort(404)
+    user = get_current_user()
+    after = request.args.get('after', 0, type=int)
+    limit = min(max(request.args.get('limit', MATRIX_QUADRANT_LIMIT, type=int), 1), MATRIX_QUADRANT_LIMIT)
+
+    todos = open_user_todos(user.id).filter(
+        Todo.priority_rank.in_(ranks),
+        Todo.id > after
+    ).order_by(Todo.id).limit(limit + 1).all()
+
+    return jsonify({
+        'todos': [{
+            'id': todo.id,
+            'title': todo.title,
+            'description': todo.description,
+            'group_name': todo.group.name,
+            'url': url_for('edit_todo', id=todo.id)
+        } for todo in todos[:limit]],
+        'has_more': len(todos) > limit
+    })
+
+@app.route('/internal/pool-stats')
+def pool_stats():
+    # Nur mit METRICS_TOKEN erreichbar, Werte gelten pro Worker-Prozess
+    token = os.getenv('METRICS_TOKEN')
+    if not token or request.headers.get('X-Metrics-Token') != token:
+        abort(404)
+    metrics = pg_pool.pool_metrics(db.engine)
+    if metrics is None:
+        metrics = {'pid': os.getpid(), 'pool': db.engine.pool.status()}
+    return jsonify(metrics)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
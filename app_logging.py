@@ -0,0 +1,151 @@
+"""
+Strukturiertes Logging für die Todo-App
+
+Log-Records werden im Request nur in eine Queue gelegt und von einem
+Hintergrund-Thread als JSON-Zeilen geschrieben, damit die synchronen
+gunicorn-Worker nicht auf Datei-I/O warten.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger('todo_app')
+
+# Felder, die jeder LogRecord hat und die nicht als Zusatzdaten ausgegeben werden
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+_queue_handler = None
+_output_handlers = []
+_listener = None
+_listener_pid = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Record, Zusatzfelder aus extra={...} werden übernommen"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'request_id': getattr(record, 'request_id', None),
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """Hängt die Correlation-ID des aktuellen Requests an den Record"""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Records ab level immer, darunter nur einen Anteil (rate zwischen 0 und 1)"""
+
+    def __init__(self, rate, level=logging.NOTSET):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+
+    def filter(self, record):
+        if record.levelno >= self.level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+def logger_level(level_name, sample_rate):
+    """Level für den Logger: bei INFO mit Sample-Rate auch DEBUG, sonst würden die
+    DEBUG-Records schon vom Logger verworfen, bevor der SamplingFilter sie sieht"""
+    level = logging.getLevelName(level_name.upper())
+    if level == logging.INFO and sample_rate > 0:
+        return logging.DEBUG
+    return level
+
+
+def _create_output_handler(log_file):
+    # In die gunicorn-Logstruktur schreiben, sonst (lokal) auf stderr
+    if log_file and os.access(os.path.dirname(log_file) or '.', os.W_OK):
+        handler = WatchedFileHandler(log_file, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def start_listener():
+    """Startet den Writer-Thread für den aktuellen Prozess (nach fork erneut aufrufen)"""
+    global _listener, _listener_pid
+
+    if _queue_handler is None or (_listener is not None and _listener_pid == os.getpid()):
+        return
+
+    # Neue Queue pro Prozess, die Queue des Master-Prozesses kann beim fork gesperrt sein
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def stop_listener():
+    """Schreibt alle gepufferten Records und beendet den Writer-Thread"""
+    global _listener
+
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(app):
+    """Konfiguriert den 'todo_app' Logger und Correlation-IDs für die Flask-App"""
+    global _queue_handler, _output_handlers
+
+    if _queue_handler is None:
+        _output_handlers = [_create_output_handler(os.getenv('LOG_FILE', '/var/log/todo-app/app.log'))]
+
+        _queue_handler = QueueHandler(queue.SimpleQueue())
+        _queue_handler.addFilter(RequestIdFilter())
+        # LOG_LEVEL=INFO (Standard): DEBUG-Records werden mit LOG_DEBUG_SAMPLE_RATE gesampelt,
+        # LOG_LEVEL=DEBUG schreibt alle, höhere Level keine
+        level_name = os.getenv('LOG_LEVEL', 'INFO')
+        sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+        _queue_handler.addFilter(SamplingFilter(sample_rate, logging.getLevelName(level_name.upper())))
+
+        logger.addHandler(_queue_handler)
+        logger.setLevel(logger_level(level_name, sample_rate))
+        logger.propagate = False
+
+        start_listener()
+        atexit.register(stop_listener)
+
+    @app.before_request
+    def assign_request_id():
+        # Vom Proxy übernommene oder neue Correlation-ID
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def add_request_id_header(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    return logger
@@ -2,8 +2,10 @@ from flask import Flask, render_template, request, redirect, url_for, flash, jso
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from sqlalchemy import case
+from sqlalchemy.orm import validates
 import argparse
 import os
+from pg_pool import engine_options
 
 app = Flask(__name__)
 
@@ -14,6 +16,8 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
 )
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dein-geheimer-schluessel')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool-Größe, Recycling, Pre-Ping und Timeouts aus der Umgebung (siehe pg_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 db = SQLAlchemy(app)
 
@@ -24,12 +28,21 @@ class TaskGroup(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     todos = db.relationship('Todo', backref='group', lazy=True, cascade='all, delete-orphan')
 
+# Sortierreihenfolge der Prioritäten (kleiner = wichtiger)
+PRIORITY_RANKS = {'urgent': 1, 'high': 2, 'medium': 3, 'low': 4}
+
 class Todo(db.Model):
+    __table_args__ = (
+        db.Index('ix_todo_group_listing', 'group_id', 'parent_id', 'completed', 'priority_rank', 'created_at'),
+        db.Index('ix_todo_open_due', 'completed', 'parent_id', 'due_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     completed = db.Column(db.Boolean, default=False)
     priority = db.Column(db.String(10), default='medium')
+    priority_rank = db.Column(db.Integer, default=PRIORITY_RANKS['medium'], nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime, nullable=True)
     group_id = db.Column(db.Integer, db.ForeignKey('task_group.id'), nullable=False)
@@ -37,6 +50,11 @@ class Todo(db.Model):
     sub_todos = db.relationship('Todo', backref=db.backref('parent', remote_side=[id]), 
                               cascade='all, delete-orphan')
 
+    @validates('priority')
+    def validate_priority(self, key, priority):
+        self.priority_rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS['medium'])
+        return priority
+
     @property
     def is_sub_todo(self):
         return self.parent_id is not None
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Inkrementelle, komprimierte Backups der SQLite-Datenbank
+
+- Kopie über die Online-Backup-API von SQLite in Schritten zu BACKUP_STEP_PAGES
+  Seiten, zwischen den Schritten ist die Datenbank für die App wieder frei
+- Die Kopie wird inhaltsdefiniert in Chunks zerlegt (Grenzen hängen vom Inhalt der
+  Seiten ab, nicht von ihrer Position) und jeder Chunk nur einmal gespeichert,
+  zlib-komprimiert unter seinem SHA-256. Ein Snapshot ist nur ein Manifest mit der
+  Liste seiner Chunks, unveränderte Teile kosten keinen Platz. Ein vorhandener
+  Chunk wird vor der Wiederverwendung entpackt und geprüft, ein beschädigter neu geschrieben
+- Jeder neue Snapshot wird sofort testweise wiederhergestellt (Prüfsumme und
+  PRAGMA integrity_check), das Manifest wird erst danach veröffentlicht
+- Snapshots älter als RETENTION_DAYS werden gelöscht, der neueste geprüfte bleibt
+  immer erhalten; danach werden nicht mehr referenzierte Chunks entfernt
+
+    python backup.py backup
+    python backup.py list
+    python backup.py verify [SNAPSHOT]
+    python backup.py restore SNAPSHOT ZIEL.db
+    python backup.py prune
+
+Layout in BACKUP_DIR:
+
+    snapshots/todos_20260101_120000.json
+    chunks/ab/ab12....z
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+BACKUP_DIR = os.getenv('BACKUP_DIR', '/home/ubuntu/backups')
+DB_PATH = os.getenv('DB_PATH', '/home/ubuntu/todo-app/instance/todos.db')
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '30'))
+
+# Seiten pro Schritt der Online-Backup-API und Pause dazwischen
+STEP_PAGES = int(os.getenv('BACKUP_STEP_PAGES', '256'))
+STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.01'))
+
+# Chunk-Grenzen in Seiten: im Mittel alle 2**CHUNK_BITS Seiten, begrenzt auf MIN/MAX
+CHUNK_BITS = 5
+MIN_CHUNK_PAGES = 8
+MAX_CHUNK_PAGES = 256
+COMPRESS_LEVEL = 6
+READ_BLOCK = 1024 * 1024
+
+
+def _snapshot_dir(backup_dir):
+    return os.path.join(backup_dir, 'snapshots')
+
+
+def _chunk_path(backup_dir, digest):
+    return os.path.join(backup_dir, 'chunks', digest[:2], digest + '.z')
+
+
+@contextmanager
+def _locked(backup_dir):
+    """Exklusiver Lock auf BACKUP_DIR, damit Backup und Aufräumen nicht gleichzeitig laufen"""
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def online_copy(db_path, target_path):
+    """Konsistente Kopie über die Backup-API, in Schritten statt mit einem langen Lock"""
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    source = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=STEP_PAGES, progress=progress, sleep=STEP_SLEEP)
+        page_size = target.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    return page_size, steps
+
+
+def iter_chunks(path, page_size):
+    """Inhaltsdefinierte Chunks der Datei: eine Grenze liegt hinter jeder Seite, deren
+    Hash in den unteren CHUNK_BITS Bits null ist. Eingefügte oder verschobene Seiten
+    (VACUUM, neue Tabellen) verschieben deshalb nur die Grenzen in ihrer Nähe."""
+    mask = (1 << CHUNK_BITS) - 1
+    with open(path, 'rb') as source:
+        pages = []
+        while True:
+            page = source.read(page_size)
+            if page:
+                pages.append(page)
+                fingerprint = int.from_bytes(hashlib.blake2b(page, digest_size=8).digest(), 'big')
+                boundary = len(pages) >= MIN_CHUNK_PAGES and fingerprint & mask == 0
+                if not boundary and len(pages) < MAX_CHUNK_PAGES:
+                    continue
+            if pages:
+                yield b''.join(pages)
+                pages = []
+            if not page:
+                return
+
+
+def _chunk_intact(path, digest):
+    """Entpackt einen gespeicherten Chunk und vergleicht seinen SHA-256 mit dem Dateinamen"""
+    checksum = hashlib.sha256()
+    decompressor = zlib.decompressobj()
+    try:
+        with open(path, 'rb') as chunk_file:
+            while True:
+                block = chunk_file.read(READ_BLOCK)
+                if not block:
+                    break
+                checksum.update(decompressor.decompress(block))
+        checksum.update(decompressor.flush())
+    except (OSError, zlib.error):
+        return False
+    return decompressor.eof and checksum.hexdigest() == digest
+
+
+def store_chunk(backup_dir, data):
+    """Speichert einen Chunk, falls noch nicht (intakt) vorhanden; liefert (Hash, neu gespeicherte Bytes)
+
+    Ein vorhandener Chunk wird nur wiederverwendet, wenn er sich entpacken lässt
+    und den erwarteten Hash hat, ein beschädigter wird neu geschrieben.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(backup_dir, digest)
+    if os.path.exists(path) and _chunk_intact(path, digest):
+        return digest, 0
+    compressed = zlib.compress(data, COMPRESS_LEVEL)
+    _write_atomic(path, compressed)
+    return digest, len(compressed)
+
+
+def load_manifest(backup_dir, name):
+    with open(os.path.join(_snapshot_dir(backup_dir), name + '.json')) as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(backup_dir, manifest):
+    path = os.path.join(_snapshot_dir(backup_dir), manifest['name'] + '.json')
+    _write_atomic(path, json.dumps(manifest, indent=1).encode())
+
+
+def list_snapshots(backup_dir):
+    """Manifeste aller Snapshots, älteste zuerst"""
+    directory = _snapshot_dir(backup_dir)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    return [load_manifest(backup_dir, name) for name in names]
+
+
+def restore(backup_dir, name, target_path):
+    """Setzt einen Snapshot Chunk für Chunk wieder zusammen und prüft die Prüfsumme"""
+    return _restore_manifest(backup_dir, load_manifest(backup_dir, name), target_path)
+
+
+def _restore_manifest(backup_dir, manifest, target_path):
+    name = manifest['name']
+    checksum = hashlib.sha256()
+    size = 0
+    with open(target_path, 'wb') as target:
+        for digest in manifest['chunks']:
+            decompressor = zlib.decompressobj()
+            with open(_chunk_path(backup_dir, digest), 'rb') as chunk_file:
+                while True:
+                    block = chunk_file.read(READ_BLOCK)
+                    try:
+                        data = decompressor.decompress(block) if block else decompressor.flush()
+                    except zlib.error as error:
+                        raise ValueError(f'{name}: Chunk {digest} beschädigt ({error})') from error
+                    checksum.update(data)
+                    target.write(data)
+                    size += len(data)
+                    if not block:
+                        break
+    if size != manifest['size'] or checksum.hexdigest() != manifest['sha256']:
+        raise ValueError(f'{name}: Prüfsumme stimmt nicht')
+    return manifest
+
+
+def verify(backup_dir, name):
+    """Testweise Wiederherstellung eines gespeicherten Snapshots, vermerkt verified_at im Manifest
+
+    Schlägt die Prüfung fehl, wird verified_at entfernt: prune() behält dann
+    nicht diesen, sondern den neuesten noch intakten Snapshot.
+    """
+    manifest = load_manifest(backup_dir, name)
+    try:
+        tables = _check_manifest(backup_dir, manifest)
+    except (ValueError, OSError, sqlite3.Error):
+        if manifest.pop('verified_at', None):
+            save_manifest(backup_dir, manifest)
+        raise
+    manifest['verified_at'] = datetime.now().isoformat(timespec='seconds')
+    save_manifest(backup_dir, manifest)
+    return tables
+
+
+def _check_manifest(backup_dir, manifest):
+    """Wiederherstellung in eine temporäre Datei mit Integritätsprüfung, gibt die Anzahl Tabellen zurück"""
+    fd, tmp_path = tempfile.mkstemp(dir=backup_dir, prefix='.verify-', suffix='.db')
+    os.close(fd)
+    try:
+        _restore_manifest(backup_dir, manifest, tmp_path)
+        connection = sqlite3.connect(f'file:{tmp_path}?mode=ro', uri=True)
+        try:
+            result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+            tables = connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            connection.close()
+        if result != 'ok':
+            raise ValueError(f'{manifest["name"]}: integrity_check meldet {result}')
+    finally:
+        os.unlink(tmp_path)
+    return tables
+
+
+def create_backup(backup_dir=BACKUP_DIR, db_path=DB_PATH):
+    """Neuer Snapshot: Online-Kopie, Chunks speichern, prüfen, Manifest schreiben
+
+    Das Manifest wird erst nach erfolgreicher Prüfung veröffentlicht, ein
+    fehlgeschlagener Snapshot taucht also nie in list/prune/restore auf. Seine
+    Chunks räumt der nächste prune() ab. Gibt (Manifest, Anzahl Tabellen) zurück.
+    """
+    started = time.monotonic()
+    name = 'todos_' + datetime.now().strftime('%Y%m%d_%H%M%S')
+    fd, copy_path = tempfile.mkstemp(dir=backup_dir, prefix='.copy-', suffix='.db')
+    os.close(fd)
+    try:
+        page_size, steps = online_copy(db_path, copy_path)
+        checksum = hashlib.sha256()
+        chunks = []
+        new_chunks = stored_bytes = size = 0
+        for data in iter_chunks(copy_path, page_size):
+            checksum.update(data)
+            size += len(data)
+            digest, written = store_chunk(backup_dir, data)
+            chunks.append(digest)
+            if written:
+                new_chunks += 1
+                stored_bytes += written
+    finally:
+        os.unlink(copy_path)
+
+    manifest = {
+        'name': name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'source': os.path.abspath(db_path),
+        'page_size': page_size,
+        'size': size,
+        'sha256': checksum.hexdigest(),
+        'chunks': chunks,
+        'new_chunks': new_chunks,
+        'stored_bytes': stored_bytes,
+        'backup_steps': steps,
+        'duration_ms': round((time.monotonic() - started) * 1000)
+    }
+    tables = _check_manifest(backup_dir, manifest)
+    manifest['verified_at'] = datetime.now().isoformat(timespec='seconds')
+    save_manifest(backup_dir, manifest)
+    return manifest, tables
+
+
+def prune(backup_dir=BACKUP_DIR, retention_days=RETENTION_DAYS):
+    """Löscht Snapshots älter als retention_days und danach unbenutzte Chunks"""
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    snapshots = list_snapshots(backup_dir)
+    verified = [manifest['name'] for manifest in snapshots if manifest.get('verified_at')]
+    keep = verified[-1] if verified else None
+
+    removed = 0
+    for manifest in snapshots:
+        if datetime.fromisoformat(manifest['created_at']) < cutoff and manifest['name'] != keep:
+            os.unlink(os.path.join(_snapshot_dir(backup_dir), manifest['name'] + '.json'))
+            removed += 1
+
+    # Vollkopien aus backup_system.sh nach derselben Regel
+    for name in os.listdir(backup_dir):
+        path = os.path.join(backup_dir, name)
+        if name.startswith('todos_') and name.endswith('.db.gz') and os.path.getmtime(path) < cutoff.timestamp():
+            os.unlink(path)
+            removed += 1
+
+    referenced = {digest for manifest in list_snapshots(backup_dir) for digest in manifest['chunks']}
+    freed = 0
+    chunk_root = os.path.join(backup_dir, 'chunks')
+    for directory, _, files in os.walk(chunk_root):
+        for name in files:
+            if name.endswith('.z') and name[:-2] not in referenced:
+                path = os.path.join(directory, name)
+                freed += os.path.getsize(path)
+                os.unlink(path)
+    return removed, freed
+
+
+def _size(num_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f'{num_bytes:.0f} {unit}' if unit == 'B' else f'{num_bytes:.1f} {unit}'
+        num_bytes /= 1024
+    return f'{num_bytes:.1f} GB'
+
+
+def cmd_backup(args):
+    if not os.path.exists(args.db):
+        print(f"❌ Datenbank nicht gefunden: {args.db}")
+        return False
+    with _locked(args.backup_dir):
+        try:
+            manifest, tables = create_backup(args.backup_dir, args.db)
+        except (ValueError, OSError, sqlite3.Error) as error:
+            print(f"❌ Backup fehlgeschlagen, kein Snapshot veröffentlicht: {error}")
+            return False
+        print(f"✅ Snapshot {manifest['name']}: {_size(manifest['size'])}, "
+              f"{manifest['new_chunks']}/{len(manifest['chunks'])} neue Chunks, "
+              f"{_size(manifest['stored_bytes'])} gespeichert, {manifest['duration_ms']} ms")
+        print(f"✅ Wiederherstellung geprüft ({tables} Tabellen)")
+        removed, freed = prune(args.backup_dir, args.retention_days)
+        if removed or freed:
+            print(f"🗑️  {removed} alte Backups gelöscht, {_size(freed)} freigegeben")
+    return True
+
+
+def cmd_list(args):
+    for manifest in list_snapshots(args.backup_dir):
+        status = '✅' if manifest.get('verified_at') else '⚠️ '
+        print(f"{status} {manifest['name']}  {_size(manifest['size']):>10}  "
+              f"+{_size(manifest['stored_bytes']):>10}  {len(manifest['chunks'])} Chunks")
+    return True
+
+
+def cmd_verify(args):
+    names = [args.snapshot] if args.snapshot else [m['name'] for m in list_snapshots(args.backup_dir)]
+    ok = True
+    for name in names:
+        # Ein defekter Snapshot bricht die Prüfung der übrigen nicht ab
+        try:
+            tables = verify(args.backup_dir, name)
+            print(f"✅ {name}: ok ({tables} Tabellen)")
+        except (ValueError, KeyError, OSError, sqlite3.Error) as error:
+            print(f"❌ {name}: {error}")
+            ok = False
+    return ok
+
+
+def cmd_restore(args):
+    if os.path.exists(args.target):
+        print(f"❌ Ziel existiert bereits: {args.target}")
+        return False
+    restored = False
+    try:
+        restore(args.backup_dir, args.snapshot, args.target)
+        restored = True
+    except (ValueError, OSError) as error:
+        print(f"❌ Wiederherstellung fehlgeschlagen: {error}")
+        return False
+    finally:
+        # Keine halbe Datenbank liegen lassen, auch nicht bei unerwarteten Fehlern oder Abbruch
+        if not restored and os.path.exists(args.target):
+            os.unlink(args.target)
+    print(f"✅ {args.snapshot} nach {args.target} wiederhergestellt")
+    return True
+
+
+def cmd_prune(args):
+    with _locked(args.backup_dir):
+        removed, freed = prune(args.backup_dir, args.retention_days)
+    print(f"🗑️  {removed} alte Backups gelöscht, {_size(freed)} freigegeben")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backup-dir', default=BACKUP_DIR)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backup').set_defaults(func=cmd_backup)
+    commands.add_parser('list').set_defaults(func=cmd_list)
+    verify_parser = commands.add_parser('verify')
+    verify_parser.add_argument('snapshot', nargs='?')
+    verify_parser.set_defaults(func=cmd_verify)
+    restore_parser = commands.add_parser('restore')
+    restore_parser.add_argument('snapshot')
+    restore_parser.add_argument('target')
+    restore_parser.set_defaults(func=cmd_restore)
+    commands.add_parser('prune').set_defaults(func=cmd_prune)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -2,36 +2,29 @@
 # Automatisches Backup-System für Todo-App
 
 # Konfiguration
+APP_DIR="/home/ubuntu/todo-app"
 BACKUP_DIR="/home/ubuntu/backups"
-DB_PATH="/home/ubuntu/todo-app/instance/todos.db"
+DB_PATH="$APP_DIR/instance/todos.db"
 S3_BUCKET="your-todo-app-backups"  # Optional: S3 für Cloud-Backup
 RETENTION_DAYS=30
 
-# Backup-Verzeichnis erstellen
-mkdir -p $BACKUP_DIR
+export BACKUP_DIR DB_PATH RETENTION_DAYS
 
-# Timestamp für Backup
-TIMESTAMP=$(date +%Y%m%d_%H%M%S)
-BACKUP_FILE="$BACKUP_DIR/todos_$TIMESTAMP.db"
+# Inkrementeller Snapshot über die SQLite-Backup-API, mit Wiederherstellungstest
+# und Aufräumen nach RETENTION_DAYS (siehe backup.py)
+OUTPUT=$("$APP_DIR/venv/bin/python" "$APP_DIR/backup.py" backup 2>&1)
+STATUS=$?
+echo "$OUTPUT"
 
-# SQLite Backup (sicher auch während Schreibvorgängen)
-sqlite3 $DB_PATH ".backup $BACKUP_FILE"
-
-# Komprimierung für Speicherplatz
-gzip $BACKUP_FILE
-
-# Alte Backups löschen (älter als RETENTION_DAYS)
-find $BACKUP_DIR -name "todos_*.db.gz" -mtime +$RETENTION_DAYS -delete
-
-# Optional: Upload zu AWS S3
-# aws s3 cp $BACKUP_FILE.gz s3://$S3_BUCKET/backups/
+# Optional: Upload zu AWS S3 (Chunks sind unveränderlich, sync lädt nur neue hoch)
+# aws s3 sync $BACKUP_DIR s3://$S3_BUCKET/backups/ --exclude ".*"
 
 # Log-Eintrag
-echo "$(date): Backup erstellt: $BACKUP_FILE.gz" >> /var/log/todo-backup.log
+echo "$(date): $OUTPUT" >> /var/log/todo-backup.log
 
 # Backup-Status prüfen
-if [ -f "$BACKUP_FILE.gz" ]; then
-    echo "✅ Backup erfolgreich: $BACKUP_FILE.gz"
+if [ $STATUS -eq 0 ]; then
+    echo "✅ Backup erfolgreich"
     exit 0
 else
     echo "❌ Backup fehlgeschlagen!"
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Lasttest pro Route mit synthetischen Daten
+
+1. Datensatz erzeugen (über die Modelle aus app.py):
+
+    python bench.py generate --db /tmp/bench.db --users 20 --groups 4 --todos 50 --subtodos 2
+
+   Neben der Datenbank entsteht /tmp/bench.db.json mit den IDs für die Lastgeneratoren.
+
+2. Last erzeugen, gegen den Flask-Test-Client und/oder einen echten gunicorn mit
+   gunicorn.conf.py. Jeder Lauf arbeitet auf einer frischen Kopie des Datensatzes,
+   die schreibenden Routes verändern das Original also nicht:
+
+    python bench.py run --db /tmp/bench.db --target both --concurrency 4 --seconds 20
+
+   Ausgabe pro Route: Requests/s, p50/p95/p99 in ms und Fehler.
+
+3. Regressionen: --save-baseline speichert das Ergebnis (bench_baseline.json),
+   spätere Läufe vergleichen dagegen und enden mit Exit-Code 1, wenn p95 oder
+   Durchsatz einer Route um mehr als --tolerance schlechter sind oder neue Fehler
+   auftreten oder Routes fehlen. Die Baseline enthält die Parameter des
+   Datensatzes und der Last; weichen sie ab, wird nicht verglichen. Vergleichbar
+   sind Baselines ohnehin nur auf derselben Maschine.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SECRET_KEY = 'bench-secret-key'
+XHR = {'X-Requested-With': 'XMLHttpRequest'}
+
+# Route-Mix: (Name, Gewicht); die Requests dazu baut build_request
+ROUTE_WEIGHTS = [
+    ('index', 25),
+    ('deadlines', 15),
+    ('matrix', 15),
+    ('api_notes', 15),
+    ('toggle', 10),
+    ('todo_new', 8),
+    ('note_autosave', 8),
+    ('note_save', 4),
+]
+PRIORITIES = ['urgent', 'high', 'medium', 'low']
+
+
+def app_environment(database_path, workdir):
+    return {
+        'DATABASE_URL': 'sqlite:///' + os.path.abspath(database_path),
+        'SECRET_KEY': SECRET_KEY,
+        'LOG_FILE': '',
+        'LOG_LEVEL': 'CRITICAL',
+        # Kein Netz beim Start: Abruf schlägt sofort fehl, Login wird hier nicht gebraucht
+        'OAUTH_METADATA_URL': 'http://127.0.0.1:9/.well-known/openid-configuration',
+        'OAUTH_METADATA_CACHE': os.path.join(workdir, 'oauth_metadata.json'),
+        # Eigener Autosave-Puffer pro Lauf, sonst teilen sich parallele Läufe instance/autosave
+        'NOTE_AUTOSAVE_DIR': os.path.join(workdir, 'autosave')
+    }
+
+
+def _import_app(database_path, workdir):
+    os.environ.update(app_environment(database_path, workdir))
+    sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def generate(args):
+    """Legt Users, Gruppen, Todos mit Sub-Todos und Notizen an und schreibt die ID-Datei"""
+    if os.path.exists(args.db):
+        print(f"❌ {args.db} existiert bereits")
+        return False
+
+    rng = random.Random(args.seed)
+    app = _import_app(args.db, os.path.dirname(os.path.abspath(args.db)))
+    from bulk import bulk_insert
+
+    started = time.monotonic()
+    now = datetime.utcnow()
+    with app.app.app_context():
+        session = app.db.session
+        user_ids = [row.id for row in bulk_insert(session, app.User, [{
+            'google_id': f'bench-{i}',
+            'email': f'bench{i}@example.com',
+            'name': f'Bench {i}'
+        } for i in range(args.users)], returning=[app.User.id])]
+
+        group_rows = [{'name': f'Gruppe {g}', 'user_id': user_id}
+                      for user_id in user_ids for g in range(args.groups)]
+        groups = bulk_insert(session, app.TaskGroup, group_rows, returning=[app.TaskGroup.id, app.TaskGroup.user_id])
+
+        todo_rows = []
+        for group in groups:
+            for i in range(args.todos):
+                priority = rng.choice(PRIORITIES)
+                # Ein Teil ohne Deadline, der Rest verteilt von leicht überfällig bis due_days
+                due_date = None
+                if rng.random() < 0.7:
+                    due_date = now + timedelta(days=rng.uniform(-args.due_days / 4, args.due_days))
+                todo_rows.append({
+                    'title': f'Todo {i}',
+                    'description': 'Beschreibung ' * rng.randint(0, 20),
+                    'completed': rng.random() < args.completed_ratio,
+                    'priority': priority,
+                    'priority_rank': app.PRIORITY_RANKS[priority],
+                    'due_date': due_date,
+                    'group_id': group.id
+                })
+        todos = bulk_insert(session, app.Todo, todo_rows, returning=[app.Todo.id, app.Todo.group_id])
+
+        sub_rows = []
+        for todo, row in zip(todos, todo_rows):
+            for i in range(rng.randint(0, args.subtodos * 2)):
+                sub_rows.append({
+                    'title': f'Sub-Todo {i}',
+                    'completed': rng.random() < args.completed_ratio,
+                    'priority': row['priority'],
+                    'priority_rank': row['priority_rank'],
+                    'group_id': todo.group_id,
+                    'parent_id': todo.id
+                })
+        bulk_insert(session, app.Todo, sub_rows)
+
+        note_rows = [{
+            'title': f'Notiz {i}',
+            'content': 'Lorem ipsum dolor sit amet. ' * max(1, int(rng.expovariate(1 / args.note_size)) // 28),
+            'user_id': user_id
+        } for user_id in user_ids for i in range(args.notes)]
+        notes = bulk_insert(session, app.Note, note_rows, returning=[app.Note.id, app.Note.user_id])
+        session.commit()
+
+    group_owner = {group.id: group.user_id for group in groups}
+    dataset = {str(user_id): {'groups': [], 'todos': [], 'notes': []} for user_id in user_ids}
+    for group in groups:
+        dataset[str(group.user_id)]['groups'].append(group.id)
+    for todo in todos:
+        dataset[str(group_owner[todo.group_id])]['todos'].append(todo.id)
+    for note in notes:
+        dataset[str(note.user_id)]['notes'].append(note.id)
+    with open(args.db + '.json', 'w') as dataset_file:
+        parameters = {key: value for key, value in vars(args).items() if key != 'func'}
+        json.dump({'users': dataset, 'parameters': parameters}, dataset_file)
+
+    print(f"✅ {len(user_ids)} Users, {len(groups)} Gruppen, {len(todos)} Todos, "
+          f"{len(sub_rows)} Sub-Todos, {len(notes)} Notizen in {time.monotonic() - started:.1f}s")
+    return True
+
+
+def build_request(route, user, rng):
+    """(Methode, Pfad, Header, Formular, JSON) für eine Route und einen User"""
+    if route == 'index':
+        return 'GET', '/?' + urlencode({'group_id': rng.choice(user['groups'])}), {}, None, None
+    if route == 'deadlines':
+        return 'GET', '/deadlines', {}, None, None
+    if route == 'matrix':
+        return 'GET', '/matrix', {}, None, None
+    if route == 'api_notes':
+        return 'GET', '/api/notes', {}, None, None
+    if route == 'toggle':
+        return 'GET', f'/todo/{rng.choice(user["todos"])}/toggle', XHR, None, None
+    if route == 'todo_new':
+        form = {'title': 'Bench', 'group_id': rng.choice(user['groups']), 'priority': rng.choice(PRIORITIES)}
+        return 'POST', '/todo/new', XHR, form, None
+    note = {'id': rng.choice(user['notes']), 'title': 'Bench', 'content': 'Lorem ipsum ' * rng.randint(10, 200)}
+    if route == 'note_autosave':
+        note['autosave'] = True
+    return 'POST', '/api/notes', {}, None, note
+
+
+class TestClientTarget:
+    """Requests direkt gegen die App im selben Prozess (ohne HTTP und gunicorn)"""
+
+    def __init__(self, config):
+        self.app = _import_app(config['database'], config['workdir']).app
+        self.clients = {}
+
+    def request(self, user_id, method, path, headers, form, json_body):
+        client = self.clients.get(user_id)
+        if client is None:
+            client = self.clients[user_id] = self.app.test_client()
+            with client.session_transaction() as session:
+                session['user'] = {'id': int(user_id), 'email': f'user{user_id}@example.com', 'name': 'Bench', 'picture': ''}
+        response = client.open(path, method=method, headers=headers, data=form, json=json_body)
+        response.close()
+        return response.status_code
+
+
+class HttpTarget:
+    """Requests über HTTP an einen laufenden Server, Session-Cookie wie von Flask signiert"""
+
+    def __init__(self, config):
+        from flask import Flask
+        signer = Flask('bench')
+        signer.secret_key = config.get('secret_key', SECRET_KEY)
+        self.serializer = signer.session_interface.get_signing_serializer(signer)
+        self.connection = http.client.HTTPConnection(config.get('host', '127.0.0.1'), config['port'], timeout=60)
+        self.cookies = {}
+        self.last_body = b''
+
+    def request(self, user_id, method, path, headers, form, json_body):
+        cookie = self.cookies.get(user_id)
+        if cookie is None:
+            cookie = self.cookies[user_id] = 'session=' + self.serializer.dumps({
+                'user': {'id': int(user_id), 'email': f'user{user_id}@example.com', 'name': 'Bench', 'picture': ''}
+            })
+        headers = dict(headers, Cookie=cookie)
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            self.last_body = response.read()
+        except (http.client.HTTPException, OSError):
+            # gunicorn schließt Verbindungen (sync-Worker, max_requests), neu verbinden
+            self.connection.close()
+            return 599
+        return response.status
+
+
+def worker(config):
+    """Ein Lastgenerator-Prozess: schickt Requests bis zum Ende und gibt die Latenzen als JSON aus"""
+    target = (TestClientTarget if config['target'] == 'client' else HttpTarget)(config)
+    with open(config['dataset']) as dataset_file:
+        users = json.load(dataset_file)['users']
+    user_ids = sorted(users)
+    rng = random.Random(config['seed'])
+    routes, weights = zip(*ROUTE_WEIGHTS)
+
+    latencies = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+    measure_from = time.monotonic() + config['warmup']
+    deadline = measure_from + config['seconds']
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        route = rng.choices(routes, weights)[0]
+        user_id = rng.choice(user_ids)
+        method, path, headers, form, json_body = build_request(route, users[user_id], rng)
+        started = time.perf_counter()
+        status = target.request(user_id, method, path, headers, form, json_body)
+        elapsed = time.perf_counter() - started
+        if now < measure_from:
+            continue
+        latencies[route].append(elapsed * 1000)
+        if status >= 400:
+            errors[route] += 1
+    print(json.dumps({'latencies': latencies, 'errors': errors}))
+
+
+def percentile(values, p):
+    # Nearest-Rank auf sortierten Werten
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)] if values else 0.0
+
+
+def summarize(results, seconds):
+    summary = {}
+    everything = []
+    total_errors = 0
+    # Routes in der Reihenfolge ihres ersten Auftretens
+    for route in dict.fromkeys(route for result in results for route in result['latencies']):
+        values = sorted(value for result in results for value in result['latencies'][route])
+        errors = sum(result['errors'].get(route, 0) for result in results)
+        everything.extend(values)
+        total_errors += errors
+        summary[route] = {
+            'requests': len(values),
+            'rps': round(len(values) / seconds, 1),
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'errors': errors
+        }
+    everything.sort()
+    summary['total'] = {
+        'requests': len(everything),
+        'rps': round(len(everything) / seconds, 1),
+        'p50': round(percentile(everything, 50), 2),
+        'p95': round(percentile(everything, 95), 2),
+        'p99': round(percentile(everything, 99), 2),
+        'errors': total_errors
+    }
+    return summary
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(database, workdir, args):
+    """gunicorn mit gunicorn.conf.py, nur Bind, Workerzahl und Logs werden überschrieben"""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', '--workers', str(args.gunicorn_workers),
+         '--access-logfile', os.devnull, '--error-logfile', os.path.join(workdir, 'gunicorn.log'),
+         'app:app'],
+        cwd=ROOT, env=dict(os.environ, **app_environment(database, workdir))
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn beendet (siehe {workdir}/gunicorn.log)')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn startet nicht')
+
+
+def stop_gunicorn(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def run_target(target, args):
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    database = os.path.join(workdir, 'todos.db')
+    shutil.copy(args.db, database)
+    server = None
+    config = {
+        'target': target,
+        'database': database,
+        'dataset': args.db + '.json',
+        'workdir': workdir,
+        'seconds': args.seconds,
+        'warmup': args.warmup
+    }
+    try:
+        if target == 'gunicorn':
+            server, config['port'] = start_gunicorn(database, workdir, args)
+        processes = [subprocess.Popen(
+            [sys.executable, __file__, '_worker', json.dumps(dict(config, seed=args.seed + i))],
+            stdout=subprocess.PIPE, text=True, cwd=ROOT
+        ) for i in range(args.concurrency)]
+        results = []
+        for process in processes:
+            out, _ = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f'Lastgenerator beendet mit Code {process.returncode}')
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    finally:
+        if server is not None:
+            stop_gunicorn(server)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return summarize(results, args.seconds)
+
+
+def compare(summary, baseline, tolerance):
+    """Liste der Regressionen gegenüber der Baseline"""
+    regressions = []
+    for route in baseline:
+        # Eine Route ohne Messwerte (Umbenennung, Fehler im Lastgenerator) ist kein Erfolg
+        if route not in summary:
+            regressions.append(f"{route}: fehlt im Ergebnis")
+    for route, current in summary.items():
+        previous = baseline.get(route)
+        if not previous:
+            continue
+        # Unter 1 ms Differenz ist Rauschen, auch wenn es prozentual viel ist
+        if current['p95'] > previous['p95'] * (1 + tolerance) and current['p95'] - previous['p95'] > 1:
+            regressions.append(f"{route}: p95 {previous['p95']} -> {current['p95']} ms")
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f"{route}: {previous['rps']} -> {current['rps']} Requests/s")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{route}: {previous['errors']} -> {current['errors']} Fehler")
+    return regressions
+
+
+def load_baselines(path, parameters):
+    """Gespeicherte Baselines pro Target, {} ohne Datei
+
+    Stammen sie aus einem Lauf mit anderen Parametern (Datensatz, Last), sind
+    die Zahlen nicht vergleichbar: dann ValueError statt eines stillen Vergleichs.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        stored = json.load(baseline_file)
+    if stored.get('parameters') != parameters:
+        previous, current = _flatten(stored.get('parameters') or {}), _flatten(parameters)
+        changed = ', '.join(f'{key}: {previous.get(key)} -> {current.get(key)}'
+                            for key in sorted(set(previous) | set(current))
+                            if previous.get(key) != current.get(key))
+        raise ValueError(f'{path} stammt aus einem Lauf mit anderen Parametern ({changed}), '
+                         f'neu erzeugen mit --save-baseline')
+    return stored['targets']
+
+
+def _flatten(parameters, prefix=''):
+    flat = {}
+    for key, value in parameters.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def dataset_parameters(dataset):
+    """Parameter von generate ohne Pfad, damit kopierte Datensätze vergleichbar bleiben"""
+    return {key: value for key, value in dataset.get('parameters', {}).items() if key not in ('command', 'db')}
+
+
+def save_baselines(path, parameters, baselines):
+    with open(path, 'w') as baseline_file:
+        json.dump({'parameters': parameters, 'targets': baselines}, baseline_file, indent=1)
+
+
+def print_summary(target, summary, baseline):
+    print(f"\n📊 {target}")
+    print(f"{'Route':<15} {'Req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'Fehler':>7} {'Δp95':>7}")
+    for route, row in summary.items():
+        previous = baseline.get(route)
+        delta = f"{(row['p95'] / previous['p95'] - 1) * 100:+.0f}%" if previous and previous['p95'] else ''
+        print(f"{route:<15} {row['rps']:>8.1f} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+              f"{row['p99']:>8.2f} {row['errors']:>7} {delta:>7}")
+
+
+def run(args):
+    if not os.path.exists(args.db + '.json'):
+        print(f"❌ {args.db}.json fehlt, zuerst bench.py generate ausführen")
+        return False
+
+    with open(args.db + '.json') as dataset_file:
+        parameters = {
+            'dataset': dataset_parameters(json.load(dataset_file)),
+            'concurrency': args.concurrency,
+            'gunicorn_workers': args.gunicorn_workers
+        }
+    try:
+        baselines = load_baselines(args.baseline, parameters)
+    except ValueError as error:
+        if not args.save_baseline:
+            print(f"❌ {error}")
+            return False
+        baselines = {}  # wird mit den neuen Parametern überschrieben
+
+    targets = ['client', 'gunicorn'] if args.target == 'both' else [args.target]
+    print(f"{args.concurrency} Lastgeneratoren, {args.seconds}s (+{args.warmup}s Warmup)")
+    ok = True
+    for target in targets:
+        summary = run_target(target, args)
+        baseline = {} if args.save_baseline else baselines.get(target, {})
+        print_summary(target, summary, baseline)
+        if baselines and not baseline and not args.save_baseline:
+            print(f"⚠️  Keine Baseline für {target}")
+        if args.save_baseline:
+            baselines[target] = summary
+            continue
+        regressions = compare(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression {regression}")
+        ok = ok and not regressions
+
+    if args.save_baseline:
+        save_baselines(args.baseline, parameters, baselines)
+        print(f"\n💾 Baseline gespeichert: {args.baseline}")
+    elif ok and baselines:
+        print("\n✅ Keine Regressionen")
+    return ok
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '_worker':
+        worker(json.loads(sys.argv[2]))
+        return True
+
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate', help='synthetischen Datensatz erzeugen')
+    generate_parser.add_argument('--db', required=True)
+    generate_parser.add_argument('--users', type=int, default=20)
+    generate_parser.add_argument('--groups', type=int, default=4, help='Gruppen pro User')
+    generate_parser.add_argument('--todos', type=int, default=50, help='Haupttodos pro Gruppe')
+    generate_parser.add_argument('--subtodos', type=int, default=2, help='Sub-Todos pro Todo im Mittel')
+    generate_parser.add_argument('--due-days', type=int, default=30, help='Spanne der Deadlines in Tagen')
+    generate_parser.add_argument('--completed-ratio', type=float, default=0.3)
+    generate_parser.add_argument('--notes', type=int, default=20, help='Notizen pro User')
+    generate_parser.add_argument('--note-size', type=int, default=2000, help='mittlere Notizgröße in Zeichen')
+    generate_parser.add_argument('--seed', type=int, default=1)
+    generate_parser.set_defaults(func=generate)
+
+    run_parser = commands.add_parser('run', help='Last erzeugen und messen')
+    run_parser.add_argument('--db', required=True)
+    run_parser.add_argument('--target', choices=['client', 'gunicorn', 'both'], default='both')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='parallele Lastgenerator-Prozesse')
+    run_parser.add_argument('--seconds', type=float, default=20)
+    run_parser.add_argument('--warmup', type=float, default=2)
+    run_parser.add_argument('--gunicorn-workers', type=int, default=2)
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--baseline', default=os.path.join(ROOT, 'bench_baseline.json'))
+    run_parser.add_argument('--save-baseline', action='store_true')
+    run_parser.add_argument('--tolerance', type=float, default=0.2, help='erlaubte Verschlechterung (0.2 = 20%%)')
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,138 @@
+"""
+Benchmark: SQLite mit Standard-Einstellungen vs. SQLITE_PERF_MODE=1
+
+Startet mehrere Prozesse (wie gunicorn-Worker), die über den Flask-Test-Client
+gleichzeitig lesen und schreiben, und gibt Durchsatz und Fehler pro Modus aus.
+Jeder Modus läuft auf einer eigenen, frisch befüllten Datenbank.
+
+    python bench_sqlite.py --workers 2 --seconds 10 --write-ratio 0.2
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _import_app(database_path, perf_mode):
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + database_path,
+        'SQLITE_PERF_MODE': '1' if perf_mode else '0',
+        'LOG_FILE': '',
+        'LOG_LEVEL': 'CRITICAL'
+    })
+    sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def seed(database_path, todos, notes):
+    app = _import_app(database_path, perf_mode=False)
+    from bulk import bulk_insert
+
+    with app.app.app_context():
+        user = app.User(google_id='bench', email='bench@example.com', name='Bench')
+        app.db.session.add(user)
+        app.db.session.flush()
+        group = app.TaskGroup(name='Bench', user_id=user.id)
+        app.db.session.add(group)
+        app.db.session.flush()
+        priorities = list(app.PRIORITY_RANKS)
+        bulk_insert(app.db.session, app.Todo, [{
+            'title': f'Todo {i}',
+            'group_id': group.id,
+            'priority': priorities[i % 4],
+            'priority_rank': app.PRIORITY_RANKS[priorities[i % 4]]
+        } for i in range(todos)])
+        bulk_insert(app.db.session, app.Note, [{
+            'title': f'Notiz {i}',
+            'content': 'Lorem ipsum ' * 50,
+            'user_id': user.id
+        } for i in range(notes)])
+        app.db.session.commit()
+        print(f'{user.id} {group.id}')
+
+
+def worker(database_path, perf_mode, seconds, write_ratio, user_id, group_id, todos):
+    app = _import_app(database_path, perf_mode)
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'id': user_id, 'email': 'bench@example.com', 'name': 'Bench', 'picture': ''}
+
+    xhr = {'X-Requested-With': 'XMLHttpRequest'}
+    reads = [f'/?group_id={group_id}', '/deadlines', '/api/notes', '/matrix']
+    ok = errors = 0
+    rng = random.Random(os.getpid())
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        if rng.random() < write_ratio:
+            if rng.random() < 0.5:
+                response = client.get(f'/todo/{rng.randint(1, todos)}/toggle', headers=xhr)
+            else:
+                response = client.post('/todo/new', headers=xhr, data={
+                    'title': 'Bench', 'group_id': group_id, 'priority': 'medium'
+                })
+        else:
+            response = client.get(rng.choice(reads))
+        if response.status_code < 400:
+            ok += 1
+        else:
+            errors += 1
+    print(f'{ok} {errors}')
+
+
+def run_mode(perf_mode, args):
+    database_path = os.path.join(tempfile.mkdtemp(prefix='bench-sqlite-'), 'todos.db')
+    seeded = subprocess.run(
+        [sys.executable, __file__, 'seed', database_path, str(args.todos), str(args.notes)],
+        check=True, capture_output=True, text=True
+    )
+    user_id, group_id = seeded.stdout.split()[-2:]
+
+    processes = [subprocess.Popen(
+        [sys.executable, __file__, 'worker', database_path, '1' if perf_mode else '0',
+         str(args.seconds), str(args.write_ratio), user_id, group_id, str(args.todos)],
+        stdout=subprocess.PIPE, text=True
+    ) for _ in range(args.workers)]
+
+    ok = errors = 0
+    for process in processes:
+        out, _ = process.communicate()
+        worker_ok, worker_errors = map(int, out.split()[-2:])
+        ok += worker_ok
+        errors += worker_errors
+    return ok / args.seconds, errors
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'seed':
+        seed(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        path, perf, seconds, ratio, user_id, group_id, todos = sys.argv[2:9]
+        worker(path, perf == '1', float(seconds), float(ratio), int(user_id), int(group_id), int(todos))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--todos', type=int, default=500)
+    parser.add_argument('--notes', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{args.workers} Worker, {args.seconds}s, Schreibanteil {args.write_ratio:.0%}')
+    print(f'{"Modus":<12} {"Requests/s":>12} {"Fehler":>8}')
+    for perf_mode in (False, True):
+        throughput, errors = run_mode(perf_mode, args)
+        print(f'{"perf" if perf_mode else "standard":<12} {throughput:>12.1f} {errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Bulk-Inserts für viele Zeilen auf einmal (Sub-Todos, Standard-Gruppen, Importe)
+
+Statt ein ORM-Objekt pro Zeile anzulegen, wird ein mehrzeiliges
+INSERT ... VALUES abgesetzt, bei Bedarf mit RETURNING für die neuen IDs.
+Sehr große Mengen werden in Blöcke geteilt, damit das Parameter-Limit der
+Datenbank (SQLite: 999 in älteren Versionen) nicht überschritten wird.
+
+Achtung: @validates und andere ORM-Events laufen hier nicht, abgeleitete
+Spalten (z.B. Todo.priority_rank) müssen in den Zeilen mitgegeben werden.
+Spalten-Defaults (created_at usw.) werden dagegen wie gewohnt gesetzt.
+"""
+
+from sqlalchemy import insert
+
+# Obergrenze an gebundenen Parametern pro Statement
+MAX_PARAMETERS = 999
+
+
+def parameters_per_row(session, table, row):
+    """Gebundene Parameter pro Zeile, inklusive Python-seitiger Spalten-Defaults
+
+    Defaults wie created_at oder completed werden als zusätzliche Parameter
+    gebunden, die Schlüssel der Zeile allein reichen daher nicht.
+    """
+    compiled = insert(table).compile(dialect=session.get_bind().dialect, column_keys=list(row))
+    return max(1, len(compiled.params))
+
+
+def bulk_insert(session, model, rows, returning=None):
+    """Fügt rows (Liste von dicts mit gleichen Schlüsseln) ein
+
+    Mit returning (z.B. [Todo.id]) werden die neuen Werte in derselben
+    Reihenfolge wie rows zurückgegeben, sonst eine leere Liste.
+    """
+    if not rows:
+        return []
+
+    table = model.__table__
+    chunk_size = max(1, MAX_PARAMETERS // parameters_per_row(session, table, rows[0]))
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+
+    if returning:
+        # "insertmanyvalues": SQLAlchemy erzeugt mehrzeilige INSERT ... VALUES ... RETURNING
+        # und sortiert das Ergebnis nach der Reihenfolge der Parameter
+        statement = insert(table).returning(*returning, sort_by_parameter_order=True)
+        return [row for chunk in chunks for row in session.execute(statement, chunk).all()]
+
+    for chunk in chunks:
+        session.execute(insert(table).values(chunk))
+    return []
@@ -22,6 +22,9 @@ source $VENV_DIR/bin/activate
 # Dependencies installieren
 pip install -r requirements.txt
 
+# Datenbank-Schema aktualisieren
+python migrate_db.py
+
 # Supervisor-Konfiguration kopieren
 sudo cp todo-app.conf /etc/supervisor/conf.d/
 
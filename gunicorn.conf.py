@@ -9,4 +9,34 @@ max_requests_jitter = 100
 preload_app = True
 accesslog = "/var/log/todo-app/access.log"
 errorlog = "/var/log/todo-app/error.log"
+# Combined-Format plus Dauer in µs und Client-IP von nginx (für replay.py)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s "%({x-real-ip}i)s"'
 loglevel = "info"
+
+
+def when_ready(server):
+    # Mit preload_app OAuth-Metadaten einmal im Master laden, die Worker erben sie beim fork
+    if server.cfg.preload_app:
+        from app import google_metadata
+        google_metadata.load()
+
+def post_fork(server, worker):
+    # Eigener Connection-Pool pro Worker
+    from app import reset_engines_after_fork
+    reset_engines_after_fork()
+
+    # Log-Writer-Thread im Worker starten (Threads überleben preload_app + fork nicht)
+    from app_logging import start_listener
+    start_listener()
+
+    # OAuth-Metadaten im Hintergrund erneuern, bevor die TTL abläuft
+    from app import google_metadata
+    google_metadata.start_refresher()
+
+def worker_exit(server, worker):
+    # Gepufferte Notiz-Autosaves und Log-Records vor dem Recycling (max_requests) schreiben
+    from app import note_autosave_buffer
+    note_autosave_buffer.stop()
+
+    from app_logging import stop_listener
+    stop_listener()
@@ -1,101 +1,477 @@
 #!/usr/bin/env python3
 """
-Datenbank-Migration für User-Support
-Fügt user_id Spalten zu bestehenden Tabellen hinzu
+Versionierte Schema-Migrationen für SQLite und PostgreSQL
+
+Jede Migration hat eine Versionsnummer und wird nach erfolgreichem Lauf in der
+Tabelle schema_version eingetragen. Die Schritte sind so gebaut, dass die App
+währenddessen weiterläuft:
+
+- Spalten werden nur hinzugefügt (SQLite: Metadaten, PostgreSQL: mit lock_timeout)
+- Backfills laufen in kleinen Transaktionen mit Pause dazwischen
+- Indizes entstehen auf PostgreSQL mit CREATE INDEX CONCURRENTLY
+- NOT NULL wird auf PostgreSQL über einen NOT VALID Check-Constraint gesetzt
+
+Alle Schritte sind idempotent, eine abgebrochene Migration kann neu gestartet werden.
+
+    python migrate_db.py                 # instance/todos.db bzw. DATABASE_URL
+    python migrate_db.py --postgres      # POSTGRES_HOST/DB/USER/PASSWORD
+    python migrate_db.py --dry-run       # offene Migrationen mit Zeitschätzung
+    python migrate_db.py --status
 """
 
-import sqlite3
+import argparse
+import math
 import os
+import sys
+import time
 from datetime import datetime
 
-def migrate_database():
-    db_path = 'instance/todos.db'
-    
-    if not os.path.exists(db_path):
-        print(f"❌ Datenbank {db_path} nicht gefunden!")
-        return False
-    
-    print(f"🔄 Starte Migration von {db_path}...")
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Prüfen ob user Tabelle existiert
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-        if not cursor.fetchone():
-            print("📝 Erstelle user Tabelle...")
-            cursor.execute('''
-                CREATE TABLE user (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    google_id VARCHAR(100) UNIQUE NOT NULL,
-                    email VARCHAR(100) UNIQUE NOT NULL,
-                    name VARCHAR(100) NOT NULL,
-                    picture VARCHAR(200),
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    last_login DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        
-        # Prüfen ob task_group bereits user_id hat
-        cursor.execute("PRAGMA table_info(task_group)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'user_id' not in columns:
-            print("📝 Füge user_id zu task_group hinzu...")
-            cursor.execute('ALTER TABLE task_group ADD COLUMN user_id INTEGER')
-            
+from sqlalchemy import create_engine, inspect, text
+
+# Muss mit PRIORITY_RANKS in app.py übereinstimmen
+PRIORITY_RANK_CASE = """CASE priority
+        WHEN 'urgent' THEN 1
+        WHEN 'high' THEN 2
+        WHEN 'low' THEN 4
+        ELSE 3
+    END"""
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description VARCHAR(200) NOT NULL,
+        applied_at TIMESTAMP NOT NULL,
+        duration_ms INTEGER NOT NULL
+    )
+"""
+
+# Index-Build ≈ Scan + Sortieren + Schreiben; grober Erfahrungswert für --dry-run
+INDEX_BUILD_FACTOR = 3
+# Backfill-Batch ≈ Lesen + Schreiben der Zeilen (inkl. Indizes); ebenfalls grob geschätzt
+BACKFILL_WRITE_FACTOR = 3
+# Sperren nicht länger anstehen lassen als das, sonst warten alle Requests hinter der Migration
+POSTGRES_LOCK_TIMEOUT = '5s'
+POSTGRES_LOCK_RETRIES = 5
+
+
+class MigrationContext:
+    """Verbindung plus Einstellungen eines Laufs"""
+
+    def __init__(self, engine, batch_size, pause):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.batch_size = batch_size
+        self.pause = pause
+
+    @property
+    def is_postgres(self):
+        return self.dialect == 'postgresql'
+
+    def columns(self, table):
+        with self.engine.connect() as conn:
+            return {column['name'] for column in inspect(conn).get_columns(table)}
+
+    def table_exists(self, table):
+        with self.engine.connect() as conn:
+            return inspect(conn).has_table(table)
+
+    def index_exists(self, table, name):
+        with self.engine.connect() as conn:
+            return name in {index['name'] for index in inspect(conn).get_indexes(table)}
+
+    def execute(self, statement, params=None):
+        """Ein Statement in einer eigenen, kurzen Transaktion"""
+        with self.engine.begin() as conn:
+            if self.is_postgres:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{POSTGRES_LOCK_TIMEOUT}'"))
+            return conn.execute(text(statement), params or {})
+
+    def execute_ddl(self, statement):
+        # DDL braucht kurz eine exklusive Sperre; bei Lock-Timeout später erneut versuchen
+        for attempt in range(1, POSTGRES_LOCK_RETRIES + 1):
+            try:
+                return self.execute(statement)
+            except Exception as e:
+                if not self.is_postgres or 'lock timeout' not in str(e) or attempt == POSTGRES_LOCK_RETRIES:
+                    raise
+                print(f"   ⏳ Sperre nicht bekommen, Versuch {attempt + 1}...")
+                time.sleep(attempt)
+
+    def timed_scan(self, table):
+        started = time.monotonic()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+        return rows, time.monotonic() - started
+
+
+# Schritte ----------------------------------------------------------------
+
+class AddColumn:
+
+    def __init__(self, table, column, ddl):
+        self.table = table
+        self.column = column
+        self.ddl = ddl
+
+    def describe(self):
+        return f'Spalte {self.table}.{self.column}'
+
+    def apply(self, ctx):
+        if self.column in ctx.columns(self.table):
+            return
+        print(f"📝 Füge {self.column} zu {self.table} hinzu...")
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" ADD COLUMN {self.column} {self.ddl}')
+
+    def estimate(self, ctx):
+        # Nur Metadaten (SQLite immer, PostgreSQL ab 11 auch mit konstantem Default)
+        return 0.0
+
+
+class Backfill:
+
+    def __init__(self, table, column, value, where):
+        self.table = table
+        self.column = column
+        self.value = value
+        self.where = where
+
+    def describe(self):
+        return f'Backfill {self.table}.{self.column}'
+
+    def _batch(self, conn, last_id, batch_size):
+        # Keyset über id: jede Transaktion fasst höchstens batch_size Zeilen an
+        upper = conn.execute(text(
+            f'SELECT MAX(id) FROM (SELECT id FROM "{self.table}" WHERE id > :last_id ORDER BY id LIMIT :limit) AS batch'
+        ), {'last_id': last_id, 'limit': batch_size}).scalar()
+        if upper is None:
+            return None, 0
+        result = conn.execute(text(
+            f'UPDATE "{self.table}" SET {self.column} = {self.value} '
+            f'WHERE id > :last_id AND id <= :upper AND ({self.where})'
+        ), {'last_id': last_id, 'upper': upper})
+        return upper, result.rowcount
+
+    def apply(self, ctx):
+        last_id, updated, batches = 0, 0, 0
+        while True:
+            with ctx.engine.begin() as conn:
+                last_id, rowcount = self._batch(conn, last_id, ctx.batch_size)
+            if last_id is None:
+                break
+            updated += rowcount
+            batches += 1
+            time.sleep(ctx.pause)
+        print(f"✅ {updated} Zeilen in {self.table}.{self.column} befüllt ({batches} Batches)")
+
+    def estimate(self, ctx):
+        rows, _ = ctx.timed_scan(self.table)
+        if not rows:
+            return 0.0
+        # Nur lesend: einen Batch auswerten, ohne DDL oder UPDATE (keine Sperren im Dry-Run).
+        # Die Spalte fehlt vor AddColumn meist noch, daher ohne self.where.
+        with ctx.engine.connect() as conn:
+            started = time.monotonic()
+            conn.execute(text(
+                f'SELECT COUNT(*) FROM (SELECT {self.value} AS value FROM "{self.table}" ORDER BY id LIMIT :limit) AS batch'
+            ), {'limit': ctx.batch_size}).scalar()
+            batch_time = (time.monotonic() - started) * BACKFILL_WRITE_FACTOR
+        return math.ceil(rows / ctx.batch_size) * (batch_time + ctx.pause)
+
+
+class CreateIndex:
+
+    def __init__(self, name, table, columns):
+        self.name = name
+        self.table = table
+        self.columns = columns
+
+    def describe(self):
+        return f'Index {self.name}'
+
+    def apply(self, ctx):
+        column_list = ', '.join(self.columns)
+        if not ctx.is_postgres:
+            # SQLite kennt keinen nebenläufigen Index-Build, Schreiber warten so lange (busy_timeout)
+            ctx.execute(f'CREATE INDEX IF NOT EXISTS {self.name} ON "{self.table}" ({column_list})')
+            return
+
+        with ctx.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            # Ein abgebrochener CONCURRENTLY-Build hinterlässt einen ungültigen Index
+            invalid = conn.execute(text(
+                'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = :name AND NOT pg_index.indisvalid'
+            ), {'name': self.name}).first()
+            if invalid:
+                print(f"🧹 Entferne ungültigen Index {self.name}...")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {self.name}'))
+            conn.execute(text(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON "{self.table}" ({column_list})'
+            ))
+
+    def estimate(self, ctx):
+        if ctx.index_exists(self.table, self.name):
+            return 0.0
+        _, scan_time = ctx.timed_scan(self.table)
+        return scan_time * INDEX_BUILD_FACTOR
+
+
+class SetNotNull:
+    """NOT NULL + Default; auf PostgreSQL ohne lange exklusive Sperre (SQLite: nicht nötig)"""
+
+    def __init__(self, table, column, default):
+        self.table = table
+        self.column = column
+        self.default = default
+
+    def describe(self):
+        return f'NOT NULL {self.table}.{self.column}'
+
+    def apply(self, ctx):
+        if not ctx.is_postgres:
+            return
+        constraint = f'{self.table}_{self.column}_not_null'
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" ALTER COLUMN {self.column} SET DEFAULT {self.default}')
+        with ctx.engine.connect() as conn:
+            nullable = conn.execute(text(
+                'SELECT is_nullable FROM information_schema.columns '
+                'WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column'
+            ), {'table': self.table, 'column': self.column}).scalar()
+        if nullable == 'NO':
+            return
+        # NOT VALID sperrt nur kurz, VALIDATE liest ohne Schreibsperre, SET NOT NULL nutzt dann den Check
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" DROP CONSTRAINT IF EXISTS {constraint}')
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" ADD CONSTRAINT {constraint} '
+                        f'CHECK ({self.column} IS NOT NULL) NOT VALID')
+        ctx.execute(f'ALTER TABLE "{self.table}" VALIDATE CONSTRAINT {constraint}')
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" ALTER COLUMN {self.column} SET NOT NULL')
+        ctx.execute_ddl(f'ALTER TABLE "{self.table}" DROP CONSTRAINT {constraint}')
+
+    def estimate(self, ctx):
+        if not ctx.is_postgres:
+            return 0.0
+        _, scan_time = ctx.timed_scan(self.table)
+        return scan_time
+
+
+class PythonStep:
+
+    def __init__(self, description, fn):
+        self.description = description
+        self.fn = fn
+
+    def describe(self):
+        return self.description
+
+    def apply(self, ctx):
+        self.fn(ctx)
+
+    def estimate(self, ctx):
+        return 0.0
+
+
+# Migrationen --------------------------------------------------------------
+
+def legacy_user_support(ctx):
+    """Altbestand vor dem Login: user Tabelle, user_id an task_group und note (nur SQLite)"""
+    if ctx.is_postgres:
+        return
+
+    if not ctx.table_exists('user'):
+        print("📝 Erstelle user Tabelle...")
+        ctx.execute('''
+            CREATE TABLE user (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                google_id VARCHAR(100) UNIQUE NOT NULL,
+                email VARCHAR(100) UNIQUE NOT NULL,
+                name VARCHAR(100) NOT NULL,
+                picture VARCHAR(200),
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_login DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    if ctx.table_exists('task_group') and 'user_id' not in ctx.columns('task_group'):
+        print("📝 Füge user_id zu task_group hinzu...")
+        with ctx.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE task_group ADD COLUMN user_id INTEGER'))
             # Standard-User erstellen (für bestehende Daten)
-            cursor.execute('''
+            user_id = conn.execute(text('''
                 INSERT INTO user (google_id, email, name, picture, created_at, last_login)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', ('temp_user_1', 'temp@example.com', 'Bestehender User', '', 
-                  datetime.utcnow(), datetime.utcnow()))
-            
-            user_id = cursor.lastrowid
-            
+                VALUES (:google_id, :email, :name, '', :now, :now)
+            '''), {'google_id': 'temp_user_1', 'email': 'temp@example.com',
+                   'name': 'Bestehender User', 'now': datetime.utcnow()}).lastrowid
             # Alle bestehenden Gruppen diesem User zuweisen
-            cursor.execute('UPDATE task_group SET user_id = ? WHERE user_id IS NULL', (user_id,))
-            print(f"✅ {cursor.rowcount} Gruppen dem Standard-User zugewiesen")
-        
-        # Prüfen ob note Tabelle existiert und user_id hinzufügen
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='note'")
-        if not cursor.fetchone():
-            print("📝 Erstelle note Tabelle...")
-            cursor.execute('''
-                CREATE TABLE note (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title VARCHAR(200) DEFAULT 'Neue Notiz',
-                    content TEXT DEFAULT '',
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    user_id INTEGER NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES user (id)
-                )
-            ''')
-        else:
-            # Prüfen ob note bereits user_id hat
-            cursor.execute("PRAGMA table_info(note)")
-            note_columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'user_id' not in note_columns:
-                print("📝 Füge user_id zu note hinzu...")
-                cursor.execute('ALTER TABLE note ADD COLUMN user_id INTEGER')
-                # Alle bestehenden Notizen dem ersten User zuweisen
-                cursor.execute('UPDATE note SET user_id = 1 WHERE user_id IS NULL')
-        
-        conn.commit()
-        conn.close()
-        
-        print("✅ Migration erfolgreich abgeschlossen!")
+            result = conn.execute(text('UPDATE task_group SET user_id = :user_id WHERE user_id IS NULL'),
+                                  {'user_id': user_id})
+            print(f"✅ {result.rowcount} Gruppen dem Standard-User zugewiesen")
+
+    if not ctx.table_exists('note'):
+        print("📝 Erstelle note Tabelle...")
+        ctx.execute('''
+            CREATE TABLE note (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title VARCHAR(200) DEFAULT 'Neue Notiz',
+                content TEXT DEFAULT '',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                user_id INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES user (id)
+            )
+        ''')
+    elif 'user_id' not in ctx.columns('note'):
+        print("📝 Füge user_id zu note hinzu...")
+        ctx.execute('ALTER TABLE note ADD COLUMN user_id INTEGER')
+        # Alle bestehenden Notizen dem ersten User zuweisen
+        ctx.execute('UPDATE note SET user_id = 1 WHERE user_id IS NULL')
+
+
+MIGRATIONS = [
+    (1, 'User-Support (user Tabelle, user_id)', [
+        PythonStep('user Tabelle und user_id (Altbestand)', legacy_user_support),
+    ]),
+    (2, 'priority_rank und Listen-Indizes für todo', [
+        AddColumn('todo', 'priority_rank', 'INTEGER'),
+        Backfill('todo', 'priority_rank', PRIORITY_RANK_CASE, 'priority_rank IS NULL'),
+        SetNotNull('todo', 'priority_rank', 3),
+        CreateIndex('ix_todo_group_listing', 'todo', ['group_id', 'parent_id', 'completed', 'priority_rank', 'created_at']),
+        CreateIndex('ix_todo_open_due', 'todo', ['completed', 'parent_id', 'due_date']),
+    ]),
+    (3, 'Versionszähler der User (Cache-Invalidierung)', [
+        AddColumn('user', 'groups_version', 'INTEGER NOT NULL DEFAULT 0'),
+        AddColumn('user', 'data_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ]),
+    (4, 'change_seq und revision für Notizen (Delta-Sync)', [
+        AddColumn('note', 'change_seq', 'INTEGER NOT NULL DEFAULT 0'),
+        AddColumn('note', 'revision', 'INTEGER NOT NULL DEFAULT 0'),
+        CreateIndex('ix_note_user_change_seq', 'note', ['user_id', 'change_seq']),
+    ]),
+    (5, 'Sync-Floor der User (Aufräumen alter Tombstones)', [
+        AddColumn('user', 'notes_sync_floor', 'INTEGER NOT NULL DEFAULT 0'),
+    ]),
+]
+
+
+# Runner -------------------------------------------------------------------
+
+def applied_versions(ctx, read_only=False):
+    # --status und --dry-run legen nichts an: ohne Tabelle ist noch nichts angewendet
+    if read_only:
+        if not ctx.table_exists('schema_version'):
+            return {}
+    else:
+        ctx.execute(SCHEMA_VERSION_TABLE)
+    with ctx.engine.connect() as conn:
+        return {row.version: row for row in conn.execute(text(
+            'SELECT version, description, applied_at, duration_ms FROM schema_version ORDER BY version'
+        ))}
+
+
+def pending_migrations(ctx, read_only=False):
+    applied = applied_versions(ctx, read_only)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def print_status(ctx):
+    applied = applied_versions(ctx, read_only=True)
+    for version, description, _ in MIGRATIONS:
+        row = applied.get(version)
+        state = f"angewendet {row.applied_at} ({row.duration_ms} ms)" if row else "offen"
+        print(f"{version:>3}  {description:<50} {state}")
+
+
+def dry_run(ctx):
+    pending = pending_migrations(ctx, read_only=True)
+    if not pending:
+        print("✅ Keine offenen Migrationen")
+        return
+    total = 0.0
+    for version, description, steps in pending:
+        print(f"🔎 {version}: {description}")
+        for step in steps:
+            seconds = step.estimate(ctx)
+            total += seconds
+            print(f"   {step.describe():<45} ~{seconds:.1f}s")
+    print(f"⏱️  Geschätzte Gesamtdauer: ~{total:.1f}s (Batch-Größe {ctx.batch_size}, Pause {ctx.pause * 1000:.0f} ms)")
+
+
+def migrate(ctx):
+    pending = pending_migrations(ctx)
+    if not pending:
+        print("✅ Schema ist aktuell")
         return True
-        
-    except Exception as e:
-        print(f"❌ Fehler bei Migration: {e}")
-        if 'conn' in locals():
-            conn.rollback()
-            conn.close()
-        return False
+
+    for version, description, steps in pending:
+        print(f"🔄 Migration {version}: {description}")
+        started = time.monotonic()
+        try:
+            for step in steps:
+                step.apply(ctx)
+        except Exception as e:
+            print(f"❌ Fehler bei Migration {version}: {e}")
+            return False
+        duration_ms = int((time.monotonic() - started) * 1000)
+        ctx.execute(
+            'INSERT INTO schema_version (version, description, applied_at, duration_ms) '
+            'VALUES (:version, :description, :applied_at, :duration_ms)',
+            {'version': version, 'description': description,
+             'applied_at': datetime.utcnow(), 'duration_ms': duration_ms}
+        )
+        print(f"✅ Migration {version} in {duration_ms} ms")
+
+    print("✅ Migration erfolgreich abgeschlossen!")
+    return True
+
+
+def database_url(args):
+    if args.database_url:
+        return args.database_url
+    if args.postgres:
+        return 'postgresql+psycopg2://{user}:{password}@{host}/{db}'.format(
+            user=os.getenv('POSTGRES_USER', 'todouser'),
+            password=os.getenv('POSTGRES_PASSWORD', 'your_password'),
+            host=os.getenv('POSTGRES_HOST', 'localhost'),
+            db=os.getenv('POSTGRES_DB', 'todoapp')
+        )
+    return os.getenv('DATABASE_URL') or 'sqlite:///instance/todos.db'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url')
+    parser.add_argument('--postgres', action='store_true')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--status', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause-ms', type=int, default=50, help='Pause zwischen Backfill-Batches')
+    args = parser.parse_args()
+
+    url = database_url(args)
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        # Neue Installation: die App legt das aktuelle Schema beim ersten Start an
+        print(f"ℹ️  Datenbank {url[len('sqlite:///'):]} nicht gefunden, nichts zu migrieren")
+        return True
+
+    # Wie die App im SQLite-Perf-Modus: auf Sperren warten statt sofort abzubrechen
+    engine = create_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+    ctx = MigrationContext(engine, args.batch_size, args.pause_ms / 1000)
+
+    if args.status:
+        print_status(ctx)
+        return True
+    if args.dry_run:
+        dry_run(ctx)
+        return True
+
+    if ctx.is_postgres:
+        # Nur ein Runner gleichzeitig (z.B. parallele Deployments)
+        with engine.connect() as lock_conn:
+            lock_conn.execute(text("SELECT pg_advisory_lock(hashtext('todo_app_migrations'))"))
+            try:
+                return migrate(ctx)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('todo_app_migrations'))"))
+    return migrate(ctx)
+
 
 if __name__ == '__main__':
-    migrate_database()
+    sys.exit(0 if main() else 1)
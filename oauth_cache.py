@@ -0,0 +1,177 @@
+"""
+Cache für OpenID-Discovery-Metadaten und JWKS des OAuth-Providers
+
+Authlib lädt beides sonst beim ersten Login nach jedem Boot bzw. Worker-Recycling
+(max_requests) synchron aus dem Netz. Hier liegen Metadaten und Schlüssel im
+Speicher und als JSON-Datei auf der Platte (gemeinsam für alle Worker), werden
+nach Ablauf der TTL im Hintergrund erneuert und direkt in den registrierten
+Authlib-Client geschrieben.
+
+Ist der Provider nicht erreichbar, wird mit dem letzten bekannten Stand
+weitergearbeitet.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger('todo_app')
+
+
+class ProviderMetadataCache:
+
+    def __init__(self, metadata_url, cache_file, ttl=21600, timeout=5):
+        self.metadata_url = metadata_url
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.timeout = timeout
+        self.metadata = None
+        self.jwks = None
+        self.fetched_at = 0
+        self._clients = []
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    def attach(self, client):
+        """Authlib-Client mit den gecachten Daten versorgen (auch nach jedem Refresh)"""
+        self._clients.append(client)
+        if self.metadata is not None:
+            self._apply(client)
+
+    def is_fresh(self):
+        return self.metadata is not None and time.time() - self.fetched_at < self.ttl
+
+    def load(self):
+        """Speicher, dann Platte, dann Netz; gibt True zurück, wenn Daten vorhanden sind"""
+        if self.is_fresh():
+            return True
+        with self._lock:
+            if self.is_fresh():
+                return True
+            if not self._load_from_disk(fresh_only=True):
+                try:
+                    self._fetch()
+                except (requests.RequestException, ValueError, KeyError) as e:
+                    # Letzter Stand von der Platte ist besser als ein hängender Login
+                    logger.warning('OAuth-Metadaten nicht abrufbar', extra={
+                        'event': 'oauth_metadata_fetch_failed', 'url': self.metadata_url, 'error': str(e)
+                    })
+                    self._load_from_disk(fresh_only=False)
+            return self.metadata is not None
+
+    def refresh(self):
+        """Erneuert die Daten ab halber TTL; ein anderer Worker hat die Datei evtl. schon aktualisiert"""
+        with self._lock:
+            self._load_from_disk(fresh_only=True, newer_only=True)
+            if self.metadata is not None and time.time() - self.fetched_at < self.ttl / 2:
+                return
+            try:
+                self._fetch()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                logger.warning('OAuth-Metadaten nicht erneuert', extra={
+                    'event': 'oauth_metadata_refresh_failed', 'url': self.metadata_url, 'error': str(e)
+                })
+
+    def ensure_fresh(self):
+        """Für Request-Pfade: blockiert nur, wenn noch gar keine Daten da sind"""
+        if self.metadata is None:
+            self.load()
+        elif not self.is_fresh() and not self._refreshing:
+            # Abgelaufen: alten Stand weiterverwenden und im Hintergrund erneuern
+            self._refreshing = True
+            threading.Thread(target=self._refresh_once, name='oauth-metadata-refresh', daemon=True).start()
+
+    def start_refresher(self):
+        """Hintergrund-Thread, der vor Ablauf der TTL erneuert (pro Prozess, nach fork erneut aufrufen)"""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='oauth-metadata', daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+
+    def _run(self):
+        stop = self._stop
+        while not stop.wait(self.ttl / 4):
+            self.refresh()
+
+    def _refresh_once(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def _fetch(self):
+        started = time.monotonic()
+        response = requests.get(self.metadata_url, timeout=self.timeout)
+        response.raise_for_status()
+        metadata = response.json()
+
+        response = requests.get(metadata['jwks_uri'], timeout=self.timeout)
+        response.raise_for_status()
+        jwks = response.json()
+
+        self._set(metadata, jwks, time.time())
+        self._save_to_disk()
+        logger.info('OAuth-Metadaten geladen', extra={
+            'event': 'oauth_metadata_fetched',
+            'url': self.metadata_url,
+            'duration_ms': round((time.monotonic() - started) * 1000, 2)
+        })
+
+    def _load_from_disk(self, fresh_only, newer_only=False):
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['url'] != self.metadata_url:
+                return False
+            fetched_at = cached['fetched_at']
+            if fresh_only and time.time() - fetched_at >= self.ttl:
+                return False
+            if newer_only and fetched_at <= self.fetched_at:
+                return False
+            self._set(cached['metadata'], cached['jwks'], fetched_at)
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _save_to_disk(self):
+        # Atomar ersetzen, damit parallel lesende Worker nie eine halbe Datei sehen
+        try:
+            directory = os.path.dirname(self.cache_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.oauth-metadata-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'url': self.metadata_url,
+                    'fetched_at': self.fetched_at,
+                    'metadata': self.metadata,
+                    'jwks': self.jwks
+                }, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning('OAuth-Metadaten nicht gespeichert', extra={
+                'event': 'oauth_metadata_save_failed', 'path': self.cache_file, 'error': str(e)
+            })
+
+    def _set(self, metadata, jwks, fetched_at):
+        self.metadata = metadata
+        self.jwks = jwks
+        self.fetched_at = fetched_at
+        for client in self._clients:
+            self._apply(client)
+
+    def _apply(self, client):
+        # _loaded_at verhindert, dass Authlib die Discovery-URL selbst abruft
+        client.server_metadata.update(self.metadata, jwks=self.jwks, _loaded_at=self.fetched_at)
@@ -0,0 +1,121 @@
+"""
+Lokaler Ersatz für Google als OpenID-Provider (Entwicklung und Tests ohne Netz)
+
+Liefert Discovery-Metadaten, JWKS sowie Authorize-, Token- und Userinfo-Endpoint.
+Der Login wird ohne Abfrage bestätigt, das ID-Token ist mit einem beim Start
+erzeugten RSA-Schlüssel signiert.
+
+Start:
+    python oauth_standin.py --port 9000
+    OAUTH_METADATA_URL=http://127.0.0.1:9000/.well-known/openid-configuration \\
+        GOOGLE_CLIENT_ID=test GOOGLE_CLIENT_SECRET=test python app.py
+
+Der angemeldete User kann über STANDIN_EMAIL / STANDIN_NAME gesetzt werden.
+"""
+
+import argparse
+import os
+import secrets
+import time
+from urllib.parse import urlencode
+
+from authlib.jose import JsonWebKey, jwt
+from flask import Flask, abort, jsonify, redirect, request
+
+app = Flask(__name__)
+
+_key = JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': 'standin'})
+# code -> Daten des Authorize-Requests, access_token -> Claims
+_codes = {}
+_tokens = {}
+
+
+def _issuer():
+    return request.host_url.rstrip('/')
+
+
+def _claims():
+    email = os.getenv('STANDIN_EMAIL', 'test@example.com')
+    return {
+        'sub': 'standin-' + email,
+        'email': email,
+        'email_verified': True,
+        'name': os.getenv('STANDIN_NAME', 'Test User'),
+        'picture': ''
+    }
+
+
+@app.route('/.well-known/openid-configuration')
+def discovery():
+    issuer = _issuer()
+    return jsonify({
+        'issuer': issuer,
+        'authorization_endpoint': issuer + '/authorize',
+        'token_endpoint': issuer + '/token',
+        'userinfo_endpoint': issuer + '/userinfo',
+        'jwks_uri': issuer + '/jwks',
+        'response_types_supported': ['code'],
+        'subject_types_supported': ['public'],
+        'id_token_signing_alg_values_supported': ['RS256'],
+        'scopes_supported': ['openid', 'email', 'profile']
+    })
+
+
+@app.route('/jwks')
+def jwks():
+    return jsonify({'keys': [_key.as_dict(is_private=False)]})
+
+
+@app.route('/authorize')
+def authorize():
+    redirect_uri = request.args.get('redirect_uri')
+    if not redirect_uri:
+        abort(400)
+    code = secrets.token_urlsafe(16)
+    _codes[code] = {
+        'client_id': request.args.get('client_id'),
+        'nonce': request.args.get('nonce')
+    }
+    params = {'code': code}
+    if request.args.get('state'):
+        params['state'] = request.args['state']
+    return redirect(redirect_uri + ('&' if '?' in redirect_uri else '?') + urlencode(params))
+
+
+@app.route('/token', methods=['POST'])
+def token():
+    grant = _codes.pop(request.form.get('code', ''), None)
+    if grant is None:
+        return jsonify({'error': 'invalid_grant'}), 400
+
+    now = int(time.time())
+    claims = dict(_claims(), iss=_issuer(), aud=grant['client_id'], iat=now, exp=now + 3600)
+    if grant['nonce']:
+        claims['nonce'] = grant['nonce']
+    id_token = jwt.encode({'alg': 'RS256', 'kid': 'standin'}, claims, _key).decode('ascii')
+
+    access_token = secrets.token_urlsafe(24)
+    _tokens[access_token] = _claims()
+    return jsonify({
+        'access_token': access_token,
+        'token_type': 'Bearer',
+        'expires_in': 3600,
+        'id_token': id_token
+    })
+
+
+@app.route('/userinfo')
+def userinfo():
+    access_token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    claims = _tokens.get(access_token)
+    if claims is None:
+        abort(401)
+    return jsonify(claims)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9000)
+    args = parser.parse_args()
+
+    app.run(port=args.port)
@@ -0,0 +1,128 @@
+"""
+Connection-Pool für das PostgreSQL-Backend, konfigurierbar über Umgebungsvariablen
+
+    PG_POOL_SIZE            feste Verbindungen pro Worker-Prozess (5)
+    PG_MAX_OVERFLOW         zusätzliche Verbindungen bei Last (10)
+    PG_POOL_TIMEOUT         Sekunden Warten auf eine freie Verbindung (30)
+    PG_POOL_RECYCLE         Verbindungen nach n Sekunden erneuern, -1 = nie (1800)
+    PG_POOL_PRE_PING        Verbindung vor der Ausgabe prüfen (1)
+    PG_STATEMENT_TIMEOUT    statement_timeout in Millisekunden, 0 = aus (0)
+    PG_PREPARE_THRESHOLD    serverseitige Prepared Statements nach n Ausführungen, 'none' = aus,
+                            leer = Treiber-Default (nur psycopg 3, psycopg2 kann das nicht)
+
+Pro Worker gilt: maximal PG_POOL_SIZE + PG_MAX_OVERFLOW Verbindungen, also
+insgesamt workers * (PG_POOL_SIZE + PG_MAX_OVERFLOW) <= max_connections.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger('todo_app')
+
+# Ab dieser Wartezeit auf eine Verbindung wird gewarnt (Pool zu klein)
+SLOW_CHECKOUT_MS = float(os.getenv('PG_POOL_SLOW_CHECKOUT_MS', '100'))
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool, der Wartende, Wartezeiten und Timeouts mitzählt"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._reentry = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get ruft sich bei Races selbst auf, nur den äußeren Aufruf messen
+        if getattr(self._reentry, 'active', False):
+            return super()._do_get()
+        self._reentry.active = True
+        with self._metrics_lock:
+            self._waiters += 1
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self._reentry.active = False
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self._waiters -= 1
+                if timed_out:
+                    self._timeouts += 1
+                else:
+                    self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            if waited * 1000 >= SLOW_CHECKOUT_MS:
+                logger.warning('Langsamer Pool-Checkout', extra={
+                    'event': 'db_pool_slow_checkout',
+                    'wait_ms': round(waited * 1000, 2),
+                    'checked_out': self.checkedout()
+                })
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'pid': os.getpid(),
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': self.checkedout(),
+                'checked_in': self.checkedin(),
+                'overflow': max(self.overflow(), 0),
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_ms_total': round(self._wait_total * 1000, 2),
+                'wait_ms_avg': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0,
+                'wait_ms_max': round(self._wait_max * 1000, 2)
+            }
+
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS für Postgres aus der Umgebung"""
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': int(os.getenv('PG_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('PG_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('PG_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('PG_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('PG_POOL_PRE_PING', '1') == '1'
+    }
+
+    connect_args = {}
+    statement_timeout = int(os.getenv('PG_STATEMENT_TIMEOUT', '0'))
+    if statement_timeout:
+        connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+
+    prepare_threshold = os.getenv('PG_PREPARE_THRESHOLD', '')
+    if prepare_threshold:
+        if make_url(database_uri).get_driver_name() == 'psycopg':
+            connect_args['prepare_threshold'] = int(prepare_threshold) if prepare_threshold != 'none' else None
+        else:
+            logger.warning('PG_PREPARE_THRESHOLD wird ignoriert, nur mit postgresql+psycopg:// verfügbar',
+                           extra={'event': 'db_pool_config'})
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def pool_metrics(engine):
+    """Kennzahlen des Pools oder None, wenn der Engine keinen MeteredQueuePool nutzt"""
+    if isinstance(engine.pool, MeteredQueuePool):
+        return engine.pool.metrics()
+    return None
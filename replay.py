@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Wiedergabe echter Zugriffe aus dem gunicorn-Access-Log gegen eine lokale Instanz
+
+1. Auf dem Server: Log in einen anonymisierten Trace umwandeln. IPs, IDs und
+   Suchbegriffe werden durch fortlaufende Pseudonyme ersetzt, Pfade auf die
+   bekannten Routes reduziert; der Trace kann ohne Bedenken kopiert werden.
+
+    python replay.py prepare /var/log/todo-app/access.log* -o trace.jsonl
+
+2. Lokal: Trace auf einen Datensatz aus bench.py abbilden und abspielen. Jeder
+   Client des Logs wird ein synthetischer User, jede pseudonyme ID eine ID
+   dieses Users. Mit --db startet gunicorn auf einer Kopie des Datensatzes,
+   sonst wird --url verwendet (SECRET_KEY muss dann zu --secret-key passen).
+
+    python bench.py generate --db /tmp/bench.db --users 50
+    python replay.py run trace.jsonl --db /tmp/bench.db --speed 1 --concurrency 8
+
+   --speed 1 spielt im Originaltempo, 10 zehnmal so schnell, 0 so schnell wie
+   möglich. Ausgabe pro Route wie bei bench.py, dazu die Dauer aus dem Log und
+   die Verspätung gegenüber dem Zeitplan. --save-baseline / --baseline vergleichen
+   zwei Builds auf demselben Trace.
+
+Das Log enthält keine Request-Bodies: Notizen, Quick-Add und Bearbeiten werden
+mit synthetischen Inhalten gesendet, POST /api/notes mit Status 202 gilt als
+Autosave. Löschende Requests werden nur mit --include-deletes abgespielt.
+Das Zeitraster des Logs ist eine Sekunde, Requests einer Sekunde werden
+gleichmäßig darauf verteilt.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import bench
+
+# access_log_format aus gunicorn.conf.py; Dauer und Client-IP fehlen in älteren Logs
+LOG_LINE = re.compile(
+    r'(?P<host>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)[^"]*" '
+    r'(?P<status>\d{3}) \S+ "[^"]*" "(?P<agent>[^"]*)"'
+    r'(?: (?P<duration>\d+) "(?P<client>[^"]*)")?'
+)
+LOG_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# (Name, Methode, Pfad-Muster, Pfad-Vorlage, löschend)
+ROUTES = [
+    ('index', 'GET', r'/', '/', False),
+    ('group_todos', 'GET', r'/api/groups/(?P<group>\d+)/todos', '/api/groups/{group}/todos', False),
+    ('deadlines', 'GET', r'/deadlines', '/deadlines', False),
+    ('matrix', 'GET', r'/matrix', '/matrix', False),
+    ('matrix_quadrant', 'GET', r'/api/matrix/(?P<quadrant>[a-z_]+)', '/api/matrix/{quadrant}', False),
+    ('notes', 'GET', r'/notes', '/notes', False),
+    ('api_notes', 'GET', r'/api/notes', '/api/notes', False),
+    ('note_get', 'GET', r'/api/notes/(?P<note>\d+)', '/api/notes/{note}', False),
+    ('note_save', 'POST', r'/api/notes', '/api/notes', False),
+    ('note_patch', 'PATCH', r'/api/notes/(?P<note>\d+)', '/api/notes/{note}', False),
+    ('note_delete', 'DELETE', r'/api/notes/(?P<note>\d+)', '/api/notes/{note}', True),
+    ('todo_form', 'GET', r'/todo/new', '/todo/new', False),
+    ('todo_new', 'POST', r'/todo/new', '/todo/new', False),
+    ('todo_edit_form', 'GET', r'/todo/(?P<todo>\d+)/edit', '/todo/{todo}/edit', False),
+    ('todo_edit', 'POST', r'/todo/(?P<todo>\d+)/edit', '/todo/{todo}/edit', False),
+    ('toggle', 'GET', r'/todo/(?P<todo>\d+)/toggle', '/todo/{todo}/toggle', False),
+    ('todo_delete', 'GET', r'/todo/(?P<todo>\d+)/delete', '/todo/{todo}/delete', True),
+    ('search', 'GET', r'/search', '/search', False),
+    ('api_search', 'GET', r'/api/search', '/api/search', False),
+]
+ROUTE_PATTERNS = [(name, method, re.compile(pattern + '$'), template, destructive)
+                  for name, method, pattern, template, destructive in ROUTES]
+ROUTE_TEMPLATES = {name: (method, template, destructive) for name, method, _, template, destructive in ROUTES}
+
+# Query-Parameter, die übernommen werden: ID-Parameter (pseudonymisiert) und Zahlen
+ID_PARAMS = {'group_id': 'group', 'parent_id': 'todo'}
+INT_PARAMS = ('page', 'limit', 'since')
+SEARCH_WORDS = ['Todo', 'Notiz', 'Lorem', 'Gruppe', 'Beschreibung', 'Sub-Todo', 'ipsum', 'Bench']
+
+
+def route_spec(route):
+    # Autosave ist im Log nur am Status zu erkennen, Route und Vorlage wie note_save
+    return ROUTE_TEMPLATES['note_save' if route == 'note_autosave' else route]
+
+
+def open_log(path):
+    return gzip.open(path, 'rt', errors='replace') if path.endswith('.gz') else open(path, errors='replace')
+
+
+class Pseudonyms:
+    """Fortlaufende Nummern statt echter Werte, getrennt nach Art (client, todo, ...)"""
+
+    def __init__(self):
+        self.values = {}
+
+    def __call__(self, kind, value):
+        mapping = self.values.setdefault(kind, {})
+        return mapping.setdefault(value, len(mapping) + 1)
+
+
+def match_route(method, path):
+    for name, route_method, pattern, _, _ in ROUTE_PATTERNS:
+        if method == route_method:
+            match = pattern.match(path)
+            if match:
+                return name, match.groupdict()
+    return None, None
+
+
+def prepare(args):
+    """Access-Logs -> anonymisierter Trace (eine JSON-Zeile pro Request)"""
+    pseudonym = Pseudonyms()
+    entries = []
+    last_note = {}
+    skipped = 0
+    for path in args.logs:
+        with open_log(path) as log_file:
+            for line in log_file:
+                match = LOG_LINE.match(line)
+                if not match:
+                    skipped += 1
+                    continue
+                target = urlsplit(match['target'])
+                route, params = match_route(match['method'], target.path)
+                if route is None:
+                    # Statische Dateien, Login, interne Routes usw.
+                    skipped += 1
+                    continue
+
+                # Ohne Client-IP von nginx bleibt nur die Verbindungs-IP, zusammen mit dem User-Agent
+                client_key = (match['client'] if match['client'] not in (None, '', '-') else match['host'])
+                client = pseudonym('client', client_key + '|' + match['agent'])
+                status = int(match['status'])
+                if route == 'note_save' and status == 202:
+                    route = 'note_autosave'
+
+                mapped = {kind: pseudonym(kind, value) for kind, value in params.items() if kind != 'quadrant'}
+                if 'quadrant' in params:
+                    mapped['quadrant'] = params['quadrant']
+                query = parse_qs(target.query)
+                for name, kind in ID_PARAMS.items():
+                    if query.get(name, [''])[0].isdigit():
+                        mapped[kind] = pseudonym(kind, query[name][0])
+                for name in INT_PARAMS:
+                    if query.get(name, [''])[0].isdigit():
+                        mapped[name] = int(query[name][0])
+                if 'q' in query:
+                    mapped['q'] = pseudonym('q', query['q'][0].strip().lower())
+                # Autosave/Speichern betrifft die zuletzt geöffnete Notiz des Clients
+                if 'note' in mapped:
+                    last_note[client] = mapped['note']
+                elif route in ('note_save', 'note_autosave') and client in last_note:
+                    mapped['note'] = last_note[client]
+
+                entries.append({
+                    'time': datetime.strptime(match['time'], LOG_TIME_FORMAT).timestamp(),
+                    'client': client,
+                    'route': route,
+                    'params': mapped,
+                    'status': status,
+                    'duration_ms': int(match['duration']) / 1000 if match['duration'] else None
+                })
+
+    # Mehrere Logdateien (Rotation) in Zeitreihenfolge, Zeit relativ zum ersten Request
+    entries.sort(key=lambda entry: entry['time'])
+    start = entries[0]['time'] if entries else 0
+    with open(args.output, 'w') as trace_file:
+        for entry in entries:
+            entry['time'] = round(entry['time'] - start, 3)
+            trace_file.write(json.dumps(entry) + '\n')
+
+    span = entries[-1]['time'] if entries else 0
+    print(f"✅ {len(entries)} Requests von {len(pseudonym.values.get('client', {}))} Clients "
+          f"über {span / 60:.1f} min nach {args.output} ({skipped} Zeilen übersprungen)")
+    return True
+
+
+def load_trace(path, limit=None):
+    with open(path) as trace_file:
+        entries = [json.loads(line) for line in trace_file if line.strip()]
+    return entries[:limit] if limit else entries
+
+
+def schedule(entries, speed):
+    """Startzeitpunkt (Sekunden ab Beginn) pro Request; Requests einer Sekunde werden verteilt"""
+    if not speed:
+        return [0.0] * len(entries)
+    per_second = {}
+    for entry in entries:
+        per_second[int(entry['time'])] = per_second.get(int(entry['time']), 0) + 1
+    offsets = []
+    seen = {}
+    for entry in entries:
+        second = int(entry['time'])
+        index = seen[second] = seen.get(second, -1) + 1
+        offsets.append((second + index / per_second[second]) / speed)
+    return offsets
+
+
+class DatasetMapping:
+    """Bildet Clients und pseudonyme IDs des Traces auf Users und IDs des Datensatzes ab"""
+
+    def __init__(self, dataset):
+        self.users = dataset['users']
+        self.user_ids = sorted(self.users, key=int)
+        self.clients = {}
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def user(self, client):
+        with self.lock:
+            if client not in self.clients:
+                # Reihenfolge des ersten Auftretens; mehr Clients als Users teilen sich Users
+                self.clients[client] = self.user_ids[len(self.clients) % len(self.user_ids)]
+            return self.clients[client]
+
+    def id(self, user_id, kind, pseudonym):
+        choices = self.users[user_id][kind + 's']
+        with self.lock:
+            mapping = self.ids.setdefault((user_id, kind), {})
+            if pseudonym not in mapping:
+                mapping[pseudonym] = choices[len(mapping) % len(choices)]
+            return mapping[pseudonym]
+
+
+def build_request(entry, user_id, mapping, revisions):
+    """(Methode, Pfad, Header, Formular, JSON) für einen Trace-Eintrag"""
+    route, params = entry['route'], entry['params']
+    method, template, _ = route_spec(route)
+    values = {'quadrant': params.get('quadrant')}
+    for kind in ('group', 'todo', 'note'):
+        if kind in params:
+            values[kind] = mapping.id(user_id, kind, params[kind])
+    path = template.format(**values)
+
+    query = {}
+    if route in ('index', 'todo_form', 'todo_new') and 'group' in values:
+        query['group_id'] = values['group']
+    if route in ('todo_form', 'todo_new') and 'todo' in values:
+        query['parent_id'] = values['todo']
+    for name in INT_PARAMS:
+        if name in params:
+            query[name] = params[name]
+    if 'q' in params:
+        query['q'] = SEARCH_WORDS[params['q'] % len(SEARCH_WORDS)]
+    if query:
+        path += '?' + urlencode(query)
+
+    note_id = values.get('note') or mapping.id(user_id, 'note', 1)
+    content = 'Lorem ipsum dolor sit amet. ' * 40
+    if route == 'todo_new':
+        group_id = values.get('group') or mapping.id(user_id, 'group', 1)
+        return method, path, bench.XHR, {'title': 'Replay', 'group_id': group_id, 'priority': 'medium'}, None
+    if route == 'todo_edit':
+        # Die XHR-Variante ändert nur Titel und Beschreibung, Sub-Todos bleiben unberührt
+        return method, path, bench.XHR, {'title': 'Replay', 'description': 'Bearbeitet'}, None
+    if route in ('toggle', 'todo_delete'):
+        return method, path, bench.XHR, None, None
+    if route == 'note_autosave':
+        return method, path, {}, None, {'id': note_id, 'autosave': True, 'title': 'Replay', 'content': content}
+    if route == 'note_save':
+        return method, path, {}, None, {'id': note_id, 'title': 'Replay', 'content': content}
+    if route == 'note_patch':
+        delta = {'start': 0, 'end': 0, 'text': 'x'}
+        return method, path, {}, None, {'base_revision': revisions.get(note_id), 'delta': delta}
+    return method, path, {}, None, None
+
+
+class Replayer:
+    def __init__(self, entries, mapping, args, config):
+        self.entries = entries
+        self.mapping = mapping
+        self.args = args
+        self.config = config
+        self.local = threading.local()
+        self.revisions = {}
+        self.latencies = {}
+        self.errors = {}
+        self.lags = []
+        self.results_lock = threading.Lock()
+
+    def target(self):
+        if not hasattr(self.local, 'target'):
+            self.local.target = bench.HttpTarget(self.config)
+        return self.local.target
+
+    def remember_revision(self, target):
+        # Antworten der Notiz-Routes (auch 409) enthalten die aktuelle Revision
+        try:
+            data = json.loads(target.last_body)
+        except ValueError:
+            return
+        if isinstance(data, dict) and 'revision' in data:
+            with self.results_lock:
+                self.revisions[data.get('id', self.local.note_id)] = data['revision']
+
+    def record(self, route, elapsed, error):
+        # elapsed None: Request nicht gesendet, zählt nur als Fehler der Route
+        with self.results_lock:
+            latencies = self.latencies.setdefault(route, [])
+            if elapsed is not None:
+                latencies.append(elapsed)
+            self.errors[route] = self.errors.get(route, 0) + bool(error)
+
+    def send(self, entry, scheduled, started_at):
+        lag = time.monotonic() - started_at - scheduled
+        target = self.target()
+        user_id = self.mapping.user(entry['client'])
+        with self.results_lock:
+            revisions = dict(self.revisions)
+        method, path, headers, form, json_body = build_request(entry, user_id, self.mapping, revisions)
+
+        note_route = entry['route'] in ('note_get', 'note_patch', 'note_save', 'note_autosave')
+        if note_route:
+            self.local.note_id = json_body['id'] if 'id' in (json_body or {}) else int(urlsplit(path).path.rsplit('/', 1)[1])
+
+        started = time.perf_counter()
+        status = target.request(user_id, method, path, headers, form, json_body)
+        elapsed = (time.perf_counter() - started) * 1000
+        if entry['route'] == 'note_patch' and status == 409:
+            # Revision unbekannt oder veraltet: erwarteter 409 (kein Fehler), die Wiederholung mit dem
+            # aktuellen Stand wie beim Editor zählt als eigene Route, sonst verfälscht sie p95 von note_patch
+            self.record('note_patch', elapsed, False)
+            self.remember_revision(target)
+            with self.results_lock:
+                json_body = dict(json_body, base_revision=self.revisions.get(self.local.note_id))
+            route = 'note_patch_retry'
+            started = time.perf_counter()
+            status = target.request(user_id, method, path, headers, form, json_body)
+            elapsed = (time.perf_counter() - started) * 1000
+        else:
+            route = entry['route']
+        if note_route and status < 400:
+            self.remember_revision(target)
+
+        self.record(route, elapsed, status >= 400)
+        with self.results_lock:
+            self.lags.append(max(lag, 0) * 1000)
+
+    def run(self):
+        offsets = schedule(self.entries, self.args.speed)
+        started_at = time.monotonic()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for entry, offset in zip(self.entries, offsets):
+                delay = started_at + offset - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append((entry, pool.submit(self.send, entry, offset, started_at)))
+        duration = time.monotonic() - started_at
+
+        # Ausnahmen in send() (z.B. User ohne Notizen im Datensatz) nicht verschlucken
+        failed = {}
+        for entry, future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                self.record(entry['route'], None, True)
+                message = f'{entry["route"]}: {error!r}'
+                failed[message] = failed.get(message, 0) + 1
+        for message, count in failed.items():
+            print(f"❌ {count}x nicht gesendet, {message}")
+        return duration
+
+
+def run(args):
+    if not args.db and not args.url:
+        print("❌ --db oder --url angeben")
+        return False
+    dataset_path = args.dataset or (args.db + '.json' if args.db else None)
+    if not dataset_path or not os.path.exists(dataset_path):
+        print("❌ Datensatz-Datei fehlt (bench.py generate, --dataset)")
+        return False
+    with open(dataset_path) as dataset_file:
+        dataset = json.load(dataset_file)
+    mapping = DatasetMapping(dataset)
+
+    entries = load_trace(args.trace, args.limit)
+    skipped = 0
+    if not args.include_deletes:
+        replayable = [entry for entry in entries if not route_spec(entry['route'])[2]]
+        skipped = len(entries) - len(replayable)
+        entries = replayable
+    if not entries:
+        print("❌ Trace enthält keine abspielbaren Requests")
+        return False
+
+    # Nur Läufe mit demselben Trace, Datensatz und Tempo sind vergleichbar
+    parameters = {
+        'dataset': bench.dataset_parameters(dataset),
+        'trace': os.path.basename(args.trace),
+        'requests': len(entries),
+        'speed': args.speed,
+        'concurrency': args.concurrency
+    }
+    try:
+        baselines = bench.load_baselines(args.baseline, parameters)
+    except ValueError as error:
+        if not args.save_baseline:
+            print(f"❌ {error}")
+            return False
+        baselines = {}
+
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    server = None
+    config = {'secret_key': args.secret_key}
+    try:
+        if args.db:
+            database = os.path.join(workdir, 'todos.db')
+            shutil.copy(args.db, database)
+            server, config['port'] = bench.start_gunicorn(database, workdir, args)
+        else:
+            url = urlsplit(args.url)
+            config['host'], config['port'] = url.hostname, url.port or 80
+
+        span = entries[-1]['time'] / args.speed if args.speed else 0
+        print(f"▶️  {len(entries)} Requests, Zeitplan {span:.0f}s, {args.concurrency} parallel"
+              + (f", {skipped} löschende übersprungen" if skipped else ''))
+        replayer = Replayer(entries, mapping, args, config)
+        duration = replayer.run()
+    finally:
+        if server is not None:
+            bench.stop_gunicorn(server)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = bench.summarize([{'latencies': replayer.latencies, 'errors': replayer.errors}], duration)
+    baseline = {} if args.save_baseline else baselines.get('replay', {})
+    bench.print_summary('replay', summary, baseline)
+
+    # Zum Vergleich: Dauer derselben Requests laut Log (nur mit Dauer im access_log_format)
+    original = {}
+    for entry in entries:
+        if entry.get('duration_ms') is not None:
+            original.setdefault(entry['route'], []).append(entry['duration_ms'])
+    if original:
+        logged = bench.summarize([{'latencies': original, 'errors': {}}], entries[-1]['time'] or 1)
+        print(f"\n{'Route':<15} {'Log p50':>8} {'Log p95':>8} {'Log p99':>8}")
+        for route, row in logged.items():
+            print(f"{route:<15} {row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f}")
+
+    lags = sorted(replayer.lags)
+    print(f"\n⏱️  {duration:.1f}s" + (f", Verspätung gegenüber Zeitplan p95 {bench.percentile(lags, 95):.0f} ms, "
+                                    f"max {lags[-1]:.0f} ms" if args.speed and lags else ''))
+
+    if args.save_baseline:
+        baselines['replay'] = summary
+        bench.save_baselines(args.baseline, parameters, baselines)
+        print(f"💾 Baseline gespeichert: {args.baseline}")
+        return True
+    regressions = bench.compare(summary, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"❌ Regression {regression}")
+    if baseline and not regressions:
+        print("✅ Keine Regressionen")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    prepare_parser = commands.add_parser('prepare', help='Access-Logs in einen anonymisierten Trace umwandeln')
+    prepare_parser.add_argument('logs', nargs='+')
+    prepare_parser.add_argument('-o', '--output', default='trace.jsonl')
+    prepare_parser.set_defaults(func=prepare)
+
+    run_parser = commands.add_parser('run', help='Trace gegen eine lokale Instanz abspielen')
+    run_parser.add_argument('trace')
+    run_parser.add_argument('--db', help='Datensatz aus bench.py, startet gunicorn auf einer Kopie')
+    run_parser.add_argument('--url', help='laufende Instanz statt --db, z.B. http://127.0.0.1:8000')
+    run_parser.add_argument('--dataset', help='ID-Datei des Datensatzes (Standard: DB.json)')
+    run_parser.add_argument('--secret-key', default=bench.SECRET_KEY)
+    run_parser.add_argument('--speed', type=float, default=1.0, help='Zeitfaktor, 0 = ohne Pausen')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--limit', type=int, help='nur die ersten n Requests')
+    run_parser.add_argument('--include-deletes', action='store_true')
+    run_parser.add_argument('--gunicorn-workers', type=int, default=2)
+    run_parser.add_argument('--baseline', default=os.path.join(bench.ROOT, 'replay_baseline.json'))
+    run_parser.add_argument('--save-baseline', action='store_true')
+    run_parser.add_argument('--tolerance', type=float, default=0.2)
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
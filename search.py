@@ -0,0 +1,185 @@
+"""
+Volltextsuche über Todos und Notizen
+
+SQLite: FTS5-Tabelle search_index, per Trigger synchron mit todo und note.
+Die rowid ist id * 2 (Todo) bzw. id * 2 + 1 (Notiz), damit Trigger gezielt
+eine Zeile ersetzen können statt die Tabelle zu durchsuchen.
+
+PostgreSQL: GIN-Indizes auf to_tsvector(...) der Spalten, die Abfrage nutzt
+exakt denselben Ausdruck.
+"""
+
+import re
+
+from markupsafe import escape, Markup
+from sqlalchemy import text
+
+SEARCH_PAGE_SIZE = 20
+
+# Marker für Treffer im Snippet, werden nach dem Escapen durch <mark> ersetzt
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TODO_ROW = """
+    SELECT NEW.id * 2, 'todo', NEW.id, task_group.user_id, NEW.title, COALESCE(NEW.description, '')
+    FROM task_group WHERE task_group.id = NEW.group_id
+"""
+_NOTE_ROW = """
+    SELECT NEW.id * 2 + 1, 'note', NEW.id, NEW.user_id, COALESCE(NEW.title, ''), COALESCE(NEW.content, '')
+"""
+_INSERT = 'INSERT INTO search_index (rowid, kind, item_id, user_id, title, body)'
+
+SQLITE_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, item_id UNINDEXED, user_id UNINDEXED, title, body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_todo_insert AFTER INSERT ON todo BEGIN
+        {_INSERT} {_TODO_ROW};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_todo_update AFTER UPDATE OF title, description, group_id ON todo BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2;
+        {_INSERT} {_TODO_ROW};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_todo_delete AFTER DELETE ON todo BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_note_insert AFTER INSERT ON note BEGIN
+        {_INSERT} {_NOTE_ROW};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_note_update AFTER UPDATE OF title, content, user_id ON note BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+        {_INSERT} {_NOTE_ROW};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_note_delete AFTER DELETE ON note BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+    END
+    """,
+]
+
+SQLITE_BACKFILL = [
+    f"""
+    {_INSERT}
+    SELECT todo.id * 2, 'todo', todo.id, task_group.user_id, todo.title, COALESCE(todo.description, '')
+    FROM todo JOIN task_group ON task_group.id = todo.group_id
+    """,
+    f"""
+    {_INSERT}
+    SELECT note.id * 2 + 1, 'note', note.id, note.user_id, COALESCE(note.title, ''), COALESCE(note.content, '')
+    FROM note
+    """,
+]
+
+# Muss exakt dem Ausdruck in den Postgres-Abfragen entsprechen, sonst wird der Index nicht genutzt
+_PG_TODO_VECTOR = "to_tsvector('german', COALESCE(todo.title, '') || ' ' || COALESCE(todo.description, ''))"
+_PG_NOTE_VECTOR = "to_tsvector('german', COALESCE(note.title, '') || ' ' || COALESCE(note.content, ''))"
+
+POSTGRES_SCHEMA = [
+    f'CREATE INDEX IF NOT EXISTS ix_todo_search ON todo USING GIN (({_PG_TODO_VECTOR}))',
+    f'CREATE INDEX IF NOT EXISTS ix_note_search ON note USING GIN (({_PG_NOTE_VECTOR}))',
+]
+
+SQLITE_SEARCH = f"""
+    SELECT kind, item_id, title,
+           snippet(search_index, -1, '{_MARK_START}', '{_MARK_END}', '…', 12) AS snippet
+    FROM search_index
+    WHERE search_index MATCH :query AND user_id = :user_id
+    ORDER BY bm25(search_index, 0, 0, 0, 2.0, 1.0)
+    LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH = f"""
+    WITH q AS (SELECT to_tsquery('german', :query) AS query),
+    page AS (
+        -- Erst ranken und begrenzen, ts_headline ist teuer und läuft nur für die Seite
+        SELECT kind, item_id, rank FROM (
+            SELECT 'todo' AS kind, todo.id AS item_id, ts_rank({_PG_TODO_VECTOR}, q.query) AS rank
+            FROM todo JOIN task_group ON task_group.id = todo.group_id, q
+            WHERE task_group.user_id = :user_id AND {_PG_TODO_VECTOR} @@ q.query
+            UNION ALL
+            SELECT 'note', note.id, ts_rank({_PG_NOTE_VECTOR}, q.query)
+            FROM note, q
+            WHERE note.user_id = :user_id AND {_PG_NOTE_VECTOR} @@ q.query
+        ) AS ranked
+        ORDER BY rank DESC, kind, item_id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.kind, page.item_id, COALESCE(todo.title, note.title) AS title,
+           ts_headline('german',
+                       CASE WHEN page.kind = 'todo' THEN COALESCE(todo.description, todo.title)
+                            ELSE COALESCE(note.content, '') END,
+                       q.query, 'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxFragments=1') AS snippet
+    FROM page CROSS JOIN q
+    LEFT JOIN todo ON page.kind = 'todo' AND todo.id = page.item_id
+    LEFT JOIN note ON page.kind = 'note' AND note.id = page.item_id
+    ORDER BY page.rank DESC, page.kind, page.item_id
+"""
+
+
+def install_search_index(engine):
+    """Legt Suchindex und Trigger an (idempotent), füllt den SQLite-Index beim ersten Mal"""
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+            )).first()
+            for statement in SQLITE_SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                for statement in SQLITE_BACKFILL:
+                    conn.execute(text(statement))
+        elif engine.dialect.name == 'postgresql':
+            for statement in POSTGRES_SCHEMA:
+                conn.execute(text(statement))
+
+
+def _search_terms(query):
+    # Nur Wörter übernehmen, damit Sonderzeichen keine Syntaxfehler in MATCH/to_tsquery auslösen
+    return re.findall(r'\w+', query)
+
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet or '')).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search(session, user_id, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Gerankte Treffer des Users als (results, has_more), jede Zeile mit kind, id, title, snippet"""
+    terms = _search_terms(query)
+    dialect = session.get_bind().dialect.name
+    if not terms or dialect not in ('sqlite', 'postgresql'):
+        return [], False
+
+    if dialect == 'sqlite':
+        statement = SQLITE_SEARCH
+        match = ' '.join(f'"{term}"*' for term in terms)
+    else:
+        statement = POSTGRES_SEARCH
+        match = ' & '.join(f'{term}:*' for term in terms)
+
+    rows = session.execute(text(statement), {
+        'query': match,
+        'user_id': user_id,
+        'limit': page_size + 1,
+        'offset': (page - 1) * page_size
+    }).all()
+
+    results = [{
+        'kind': row.kind,
+        'id': int(row.item_id),
+        'title': row.title,
+        'snippet': _highlight(row.snippet)
+    } for row in rows[:page_size]]
+    return results, len(rows) > page_size
@@ -0,0 +1,102 @@
+"""
+SQLite-Performance-Modus (opt-in über SQLITE_PERF_MODE=1)
+
+- WAL-Journal, busy_timeout, synchronous=NORMAL, mmap_size und cache_size auf
+  jeder Verbindung
+- GET/HEAD-Requests lesen über einen eigenen Pool mit query_only-Verbindungen,
+  jeder Request sieht dabei einen konsistenten Snapshot
+- Schreiben läuft pro Prozess über genau eine Verbindung, Transaktionen starten
+  mit BEGIN IMMEDIATE, so dass Schreiber prozessübergreifend am Lock warten
+  (busy_timeout) statt mitten in der Transaktion mit "database is locked" abzubrechen
+"""
+
+import os
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ('GET', 'HEAD')
+
+PRAGMAS = {
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),  # negativ = KiB, also 64 MB
+    'temp_store': 'MEMORY'
+}
+
+
+def is_enabled(database_uri):
+    return os.getenv('SQLITE_PERF_MODE', '0') == '1' and database_uri.startswith('sqlite')
+
+
+def engine_options():
+    """SQLALCHEMY_ENGINE_OPTIONS für den Schreib-Engine: genau eine Verbindung pro Prozess"""
+    return {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': PRAGMAS['busy_timeout'] / 1000 * 2
+    }
+
+
+def _configure(engine, begin_statement, read_only):
+    # Eigene Transaktionssteuerung statt der impliziten BEGINs von pysqlite
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        for name, value in PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        connection.exec_driver_sql(begin_statement)
+
+
+def init_app(app, db):
+    """Konfiguriert den Schreib-Engine und legt den Lese-Engine an (im App-Context aufrufen)"""
+    writer = db.engine
+    _configure(writer, 'BEGIN IMMEDIATE', read_only=False)
+    # Verbindungen, die vor der Konfiguration geöffnet wurden, verwerfen
+    writer.dispose()
+
+    reader = create_engine(
+        writer.url,
+        pool_size=int(os.getenv('SQLITE_READ_POOL_SIZE', '4')),
+        max_overflow=0
+    )
+    _configure(reader, 'BEGIN', read_only=True)
+    app.extensions['sqlite_read_engine'] = reader
+    return reader
+
+
+class RoutingSession(Session):
+    """Session, die Lesezugriffe in GET/HEAD-Requests auf den Lese-Engine legt"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        reader = current_app.extensions.get('sqlite_read_engine') if bind is None else None
+        if reader is None:
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+        # Schreiben (Flush, UPDATE/DELETE/INSERT) immer über den Writer; danach bleibt
+        # die Transaktion dort, damit eigene Änderungen sichtbar sind
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['sqlite_wrote'] = True
+        if (self.info.get('sqlite_wrote')
+                or not has_request_context()
+                or request.method not in READ_METHODS):
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        return reader
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _reset_write_flag(session):
+    session.info.pop('sqlite_wrote', None)
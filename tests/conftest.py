@@ -0,0 +1,61 @@
+"""
+Gemeinsame Fixtures: die App läuft gegen eine temporäre SQLite-Datenbank
+
+app.py liest seine Konfiguration beim Import, deshalb wird die Umgebung hier
+gesetzt, bevor die Tests app importieren.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_tmpdir = tempfile.mkdtemp(prefix='todo-tests-')
+
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_tmpdir, 'todos.db'),
+    'SECRET_KEY': 'test-secret-key',
+    'LOG_FILE': '',
+    'LOG_LEVEL': 'CRITICAL',
+    # Kein Netz: Abruf schlägt sofort fehl, Login läuft in den Tests über die Session
+    'OAUTH_METADATA_URL': 'http://127.0.0.1:9/.well-known/openid-configuration',
+    'OAUTH_METADATA_CACHE': os.path.join(_tmpdir, 'oauth_metadata.json'),
+    'NOTE_AUTOSAVE_DIR': os.path.join(_tmpdir, 'autosave'),
+    'SQLITE_PERF_MODE': '0'
+})
+sys.path.insert(0, ROOT)
+
+import app as todo_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    todo_app.app.config.update(TESTING=True, QUERY_COUNT_HEADER=True)
+    yield todo_app
+    # Jeder Test beginnt mit leerer Datenbank und leeren prozesslokalen Caches
+    todo_app.note_autosave_buffer.flush()
+    with todo_app.app.app_context():
+        todo_app.db.session.remove()
+        for table in reversed(todo_app.db.metadata.sorted_tables):
+            todo_app.db.session.execute(table.delete())
+        todo_app.db.session.commit()
+    todo_app.group_nav_cache = todo_app.FragmentCache()
+
+
+@pytest.fixture
+def user(app):
+    with app.app.app_context():
+        user = app.User(google_id='test', email='test@example.com', name='Test')
+        app.db.session.add(user)
+        app.db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'id': user, 'email': 'test@example.com', 'name': 'Test', 'picture': ''}
+    return client
@@ -0,0 +1,128 @@
+"""backup.py: Veröffentlichung nach Prüfung, Deduplizierung, Aufräumen und beschädigte Chunks"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import backup
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'todos.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE todo (id INTEGER PRIMARY KEY, title TEXT)')
+    # Groß genug für mehrere Chunks
+    connection.executemany('INSERT INTO todo (title) VALUES (?)', [(f'Todo {i} ' + 'x' * 200,) for i in range(5000)])
+    connection.commit()
+    connection.close()
+    return path
+
+
+def test_verified_snapshot_is_published(tmp_path, db_path):
+    backup_dir = str(tmp_path)
+    manifest, tables = backup.create_backup(backup_dir, db_path)
+    assert tables == 1
+    assert [m['name'] for m in backup.list_snapshots(backup_dir)] == [manifest['name']]
+    assert backup.load_manifest(backup_dir, manifest['name'])['verified_at']
+
+
+def test_failed_verification_publishes_nothing(tmp_path, db_path, monkeypatch):
+    backup_dir = str(tmp_path)
+
+    def corrupt(backup_dir, manifest, target_path):
+        raise ValueError(f'{manifest["name"]}: Prüfsumme stimmt nicht')
+
+    monkeypatch.setattr(backup, '_restore_manifest', corrupt)
+    with pytest.raises(ValueError):
+        backup.create_backup(backup_dir, db_path)
+    assert backup.list_snapshots(backup_dir) == []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Steuerbare Uhr für Snapshot-Namen und created_at"""
+    class Clock(datetime):
+        current = datetime(2026, 1, 1, 12, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(backup, 'datetime', Clock)
+    return Clock
+
+
+def chunk_files(backup_dir):
+    return {name[:-2] for _, _, files in os.walk(os.path.join(backup_dir, 'chunks')) for name in files}
+
+
+def test_unchanged_chunks_are_shared(tmp_path, db_path, clock):
+    backup_dir = str(tmp_path)
+    first, _ = backup.create_backup(backup_dir, db_path)
+    assert first['new_chunks'] == len(first['chunks']) > 1
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("UPDATE todo SET title = 'geändert' WHERE id = 4000")
+    connection.commit()
+    connection.close()
+
+    clock.current += timedelta(minutes=1)
+    second, _ = backup.create_backup(backup_dir, db_path)
+    assert 0 < second['new_chunks'] < len(second['chunks'])
+    assert chunk_files(backup_dir) == set(first['chunks']) | set(second['chunks'])
+
+
+def test_prune_keeps_newest_verified_snapshot(tmp_path, db_path, clock):
+    backup_dir = str(tmp_path)
+    clock.current = datetime.now() - timedelta(days=40)
+    old, _ = backup.create_backup(backup_dir, db_path)
+
+    connection = sqlite3.connect(db_path)
+    connection.execute('DELETE FROM todo WHERE id > 100')
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+
+    clock.current += timedelta(days=5)
+    newest, _ = backup.create_backup(backup_dir, db_path)
+
+    # Beide älter als RETENTION_DAYS, der neueste geprüfte bleibt trotzdem
+    clock.current = datetime.now()
+    removed, freed = backup.prune(backup_dir, retention_days=30)
+    assert removed == 1 and freed > 0
+    assert [m['name'] for m in backup.list_snapshots(backup_dir)] == [newest['name']]
+    assert chunk_files(backup_dir) == set(newest['chunks'])
+    assert set(old['chunks']) - set(newest['chunks'])
+
+
+def test_corrupted_chunk_is_detected_and_rewritten(tmp_path, db_path, clock, capsys):
+    backup_dir = str(tmp_path)
+    first, _ = backup.create_backup(backup_dir, db_path)
+    clock.current += timedelta(minutes=1)
+    second, _ = backup.create_backup(backup_dir, db_path)
+
+    digest = first['chunks'][1]
+    with open(backup._chunk_path(backup_dir, digest), 'wb') as chunk_file:
+        chunk_file.write(b'kein zlib')
+
+    with pytest.raises(ValueError, match=digest):
+        backup.verify(backup_dir, first['name'])
+    assert 'verified_at' not in backup.load_manifest(backup_dir, first['name'])
+
+    # verify prüft alle Snapshots weiter, restore lässt keine halbe Datei liegen
+    args = SimpleNamespace(backup_dir=backup_dir, snapshot=None, target=str(tmp_path / 'restored.db'))
+    assert not backup.cmd_verify(args)
+    assert capsys.readouterr().out.count('❌') == 2
+    args.snapshot = second['name']
+    assert not backup.cmd_restore(args)
+    assert not os.path.exists(args.target)
+
+    # Das nächste Backup verwendet den beschädigten Chunk nicht, sondern schreibt ihn neu
+    clock.current += timedelta(minutes=1)
+    third, _ = backup.create_backup(backup_dir, db_path)
+    assert third['new_chunks'] >= 1
+    assert backup.verify(backup_dir, second['name']) == 1
@@ -0,0 +1,54 @@
+"""bench.py: Vergleich mit der Baseline und ein kurzer Lauf gegen den Test-Client"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import bench
+
+ROUTE = {'requests': 10, 'rps': 10.0, 'p50': 1.0, 'p95': 2.0, 'p99': 3.0, 'errors': 0}
+
+
+def test_compare_reports_missing_route():
+    baseline = {'index': ROUTE, 'matrix': ROUTE}
+    assert bench.compare({'index': ROUTE}, baseline, 0.2) == ['matrix: fehlt im Ergebnis']
+
+
+def test_compare_reports_slower_route():
+    slower = dict(ROUTE, p95=5.0)
+    assert bench.compare({'index': slower}, {'index': ROUTE}, 0.2) == ['index: p95 2.0 -> 5.0 ms']
+
+
+def test_baseline_from_other_dataset_is_refused(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    bench.save_baselines(path, {'dataset': {'users': 20}}, {'client': {'index': ROUTE}})
+    assert bench.load_baselines(path, {'dataset': {'users': 20}}) == {'client': {'index': ROUTE}}
+    with pytest.raises(ValueError, match='dataset.users: 20 -> 50'):
+        bench.load_baselines(path, {'dataset': {'users': 50}})
+
+
+def test_smoke_run(tmp_path):
+    db = str(tmp_path / 'bench.db')
+    baseline = str(tmp_path / 'baseline.json')
+
+    def bench_cli(*args):
+        return subprocess.run([sys.executable, bench.__file__, *args], cwd=bench.ROOT,
+                              capture_output=True, text=True, timeout=120)
+
+    generated = bench_cli('generate', '--db', db, '--users', '2', '--groups', '1', '--todos', '3',
+                          '--notes', '2', '--note-size', '100')
+    assert generated.returncode == 0, generated.stderr
+    assert os.path.exists(db + '.json')
+
+    run = ['run', '--db', db, '--target', 'client', '--concurrency', '1', '--seconds', '1',
+           '--warmup', '0', '--baseline', baseline]
+    saved = bench_cli(*run, '--save-baseline')
+    assert saved.returncode == 0, saved.stdout + saved.stderr
+    assert 'total' in saved.stdout
+
+    compared = bench_cli(*run, '--tolerance', '100')
+    assert compared.returncode == 0, compared.stdout + compared.stderr
+    # Andere Last als in der Baseline: kein Vergleich, Exit-Code 1
+    assert bench_cli(*run, '--concurrency', '2').returncode == 1
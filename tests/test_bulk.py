@@ -0,0 +1,53 @@
+"""bulk_insert bleibt mit Spalten-Defaults unter MAX_PARAMETERS, auch mit RETURNING"""
+
+import pytest
+from sqlalchemy import event
+
+from bulk import MAX_PARAMETERS, bulk_insert
+
+
+@pytest.fixture
+def group_id(app, user):
+    with app.app.app_context():
+        group = app.TaskGroup(name='Arbeit', user_id=user)
+        app.db.session.add(group)
+        app.db.session.commit()
+        return group.id
+
+
+def todo_rows(group_id, count):
+    return [{
+        'title': f'Todo {i}',
+        'group_id': group_id,
+        'parent_id': None,
+        'priority': 'medium',
+        'priority_rank': 3
+    } for i in range(count)]
+
+
+@pytest.mark.parametrize('returning', [False, True])
+def test_chunks_respect_parameter_limit(app, group_id, returning):
+    parameters = []
+
+    def record(conn, cursor, statement, params, context, executemany):
+        parameters.append(len(params))
+
+    with app.app.app_context():
+        engine = app.db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            rows = bulk_insert(app.db.session, app.Todo, todo_rows(group_id, 199),
+                               returning=[app.Todo.id, app.Todo.title] if returning else None)
+            app.db.session.commit()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+        # 199 Zeilen * 7 Parameter (5 Schlüssel + completed, created_at) = 1393
+        assert max(parameters) <= MAX_PARAMETERS
+        assert sum(parameters) == 199 * 7
+        assert app.Todo.query.count() == 199
+        if not returning:
+            assert len(parameters) == 2
+        else:
+            assert [row.title for row in rows] == [f'Todo {i}' for i in range(199)]
+            assert [row.id for row in rows] == sorted(row.id for row in rows)
@@ -0,0 +1,58 @@
+"""data_version wird in SQL erhöht: kein Lost Update zwischen Workern, ETags passen zum Stand"""
+
+from sqlalchemy import text
+
+
+def test_bump_does_not_lose_concurrent_increment(app, user):
+    with app.app.app_context():
+        stale = app.db.session.get(app.User, user)
+        assert stale.data_version == 0
+
+        # Ein anderer Worker erhöht inzwischen über eine eigene Verbindung
+        with app.db.engine.begin() as other:
+            other.execute(text('UPDATE user SET data_version = data_version + 5 WHERE id = :id'), {'id': user})
+
+        assert app.bump_data_version(stale) == 6
+        assert stale.data_version == 6
+        app.db.session.commit()
+        assert app.db.session.query(app.User.data_version).filter_by(id=user).scalar() == 6
+
+
+def test_etag_changes_after_write(app, user, client):
+    with app.app.app_context():
+        group = app.TaskGroup(name='Arbeit', user_id=user)
+        app.db.session.add(group)
+        app.db.session.flush()
+        todo = app.Todo(title='Einkaufen', group_id=group.id)
+        app.db.session.add(todo)
+        app.db.session.commit()
+        todo_id = todo.id
+
+    etag = client.get('/deadlines').headers['ETag']
+    assert client.get('/deadlines', headers={'If-None-Match': etag}).status_code == 304
+
+    client.get(f'/todo/{todo_id}/toggle', headers={'X-Requested-With': 'XMLHttpRequest'})
+    response = client.get('/deadlines', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_bump_groups_version_is_atomic(app, user):
+    with app.app.app_context():
+        stale = app.db.session.get(app.User, user)
+        with app.db.engine.begin() as other:
+            other.execute(text('UPDATE user SET groups_version = groups_version + 1 WHERE id = :id'), {'id': user})
+
+        app.bump_groups_version(stale)
+        app.db.session.commit()
+        groups_version, data_version = app.db.session.query(
+            app.User.groups_version, app.User.data_version
+        ).filter_by(id=user).one()
+        assert (groups_version, data_version) == (2, 1)
+
+
+def test_group_nav_is_rerendered_after_group_change(app, user, client):
+    client.post('/group/new', data={'name': 'Arbeit'})
+    assert 'Arbeit' in client.get('/').get_data(as_text=True)
+    client.post('/group/new', data={'name': 'Urlaub'})
+    assert 'Urlaub' in client.get('/').get_data(as_text=True)
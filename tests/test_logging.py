@@ -0,0 +1,44 @@
+"""Gesampelte DEBUG-Events kommen bei LOG_LEVEL=INFO beim SamplingFilter an"""
+
+import logging
+
+from app_logging import SamplingFilter, logger_level
+
+
+def record(level):
+    return logging.LogRecord('todo_app', level, __file__, 1, 'test', (), None)
+
+
+def test_info_with_sample_rate_lets_debug_reach_the_filter():
+    assert logger_level('INFO', 0.01) == logging.DEBUG
+    assert logger_level('info', 0) == logging.INFO
+    assert logger_level('WARNING', 0.01) == logging.WARNING
+    assert logger_level('DEBUG', 0.01) == logging.DEBUG
+
+
+def test_sampling_filter_samples_only_below_level():
+    always = SamplingFilter(1.0, logging.INFO)
+    never = SamplingFilter(0.0, logging.INFO)
+    assert always.filter(record(logging.DEBUG))
+    assert not never.filter(record(logging.DEBUG))
+    assert never.filter(record(logging.INFO))
+    assert never.filter(record(logging.ERROR))
+
+
+def test_sampled_debug_event_is_emitted_at_info(monkeypatch):
+    logger = logging.getLogger('todo_app.sampling_test')
+    logger.propagate = False
+    logger.setLevel(logger_level('INFO', 0.5))
+    emitted = []
+    handler = logging.Handler()
+    handler.emit = emitted.append
+    handler.addFilter(SamplingFilter(0.5, logging.INFO))
+    logger.addHandler(handler)
+
+    monkeypatch.setattr('app_logging.random.random', lambda: 0.1)
+    logger.debug('Sub-Todos abgeglichen', extra={'event': 'sub_todos_synced'})
+    monkeypatch.setattr('app_logging.random.random', lambda: 0.9)
+    logger.debug('Sub-Todos abgeglichen', extra={'event': 'sub_todos_synced'})
+    logger.removeHandler(handler)
+
+    assert [entry.event for entry in emitted] == ['sub_todos_synced']
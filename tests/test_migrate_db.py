@@ -0,0 +1,116 @@
+"""migrate_db.py auf einer SQLite-Datenbank mit dem Schema vor den Migrationen"""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import migrate_db
+
+PRIORITIES = ['urgent', 'high', 'medium', 'low', None]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'todos.db')
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE user (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            google_id VARCHAR(100) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            picture VARCHAR(200),
+            created_at DATETIME,
+            last_login DATETIME
+        );
+        CREATE TABLE task_group (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            created_at DATETIME,
+            user_id INTEGER NOT NULL REFERENCES user (id)
+        );
+        CREATE TABLE todo (
+            id INTEGER PRIMARY KEY,
+            title VARCHAR(200) NOT NULL,
+            description TEXT,
+            completed BOOLEAN,
+            priority VARCHAR(10),
+            created_at DATETIME,
+            due_date DATETIME,
+            group_id INTEGER NOT NULL REFERENCES task_group (id),
+            parent_id INTEGER REFERENCES todo (id)
+        );
+        CREATE TABLE note (
+            id INTEGER PRIMARY KEY,
+            title VARCHAR(200),
+            content TEXT,
+            created_at DATETIME,
+            updated_at DATETIME,
+            user_id INTEGER NOT NULL REFERENCES user (id)
+        );
+        INSERT INTO user (google_id, email, name) VALUES ('g1', 'a@example.com', 'A');
+        INSERT INTO task_group (name, user_id) VALUES ('Arbeit', 1);
+        INSERT INTO note (title, content, user_id) VALUES ('Notiz', 'Text', 1);
+    ''')
+    # Mehrere Batches, jede Priorität kommt mehrfach vor
+    connection.executemany('INSERT INTO todo (title, priority, group_id) VALUES (?, ?, 1)',
+                           [(f'Todo {i}', PRIORITIES[i % len(PRIORITIES)]) for i in range(25)])
+    connection.commit()
+    connection.close()
+    return path
+
+
+@pytest.fixture
+def ctx(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    yield migrate_db.MigrationContext(engine, batch_size=10, pause=0)
+    engine.dispose()
+
+
+def dump(path):
+    connection = sqlite3.connect(path)
+    try:
+        return list(connection.iterdump())
+    finally:
+        connection.close()
+
+
+def test_all_versions_apply(ctx):
+    assert migrate_db.migrate(ctx)
+    assert set(migrate_db.applied_versions(ctx)) == {version for version, _, _ in migrate_db.MIGRATIONS}
+    assert {'priority_rank'} <= ctx.columns('todo')
+    assert {'change_seq', 'revision'} <= ctx.columns('note')
+    assert {'groups_version', 'data_version', 'notes_sync_floor'} <= ctx.columns('user')
+    assert ctx.index_exists('todo', 'ix_todo_group_listing')
+    assert ctx.index_exists('note', 'ix_note_user_change_seq')
+
+
+def test_priority_rank_is_backfilled_per_priority(ctx, db_path):
+    assert migrate_db.migrate(ctx)
+    connection = sqlite3.connect(db_path)
+    rows = set(connection.execute('SELECT priority, priority_rank FROM todo'))
+    connection.close()
+    assert rows == {('urgent', 1), ('high', 2), ('medium', 3), ('low', 4), (None, 3)}
+
+
+def test_rerun_is_a_no_op(ctx, db_path, capsys):
+    assert migrate_db.migrate(ctx)
+    migrated = dump(db_path)
+    capsys.readouterr()
+
+    assert migrate_db.migrate(ctx)
+    assert capsys.readouterr().out.strip() == '✅ Schema ist aktuell'
+    assert dump(db_path) == migrated
+
+
+def test_dry_run_and_status_change_nothing(ctx, db_path, capsys):
+    before = dump(db_path)
+    migrate_db.dry_run(ctx)
+    migrate_db.print_status(ctx)
+    assert dump(db_path) == before
+    assert not ctx.table_exists('schema_version')
+
+    out = capsys.readouterr().out
+    assert 'Backfill todo.priority_rank' in out
+    assert 'offen' in out
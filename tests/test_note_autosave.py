@@ -0,0 +1,77 @@
+"""Autosave über den gemeinsamen Schreibpuffer: sichtbar in allen Workern, fehlerhafte IDs ergeben 400"""
+
+import pytest
+
+from write_buffer import SharedWriteBehindBuffer
+
+
+@pytest.mark.parametrize('note_id', [None, 'abc', [1]])
+def test_autosave_rejects_invalid_id(app, user, client, note_id):
+    body = {'autosave': True, 'title': 'T', 'content': 'C'}
+    if note_id is not None:
+        body['id'] = note_id
+    assert client.post('/api/notes', json=body).status_code == 400
+
+
+def test_autosave_is_visible_before_flush(app, user, client):
+    note_id = client.post('/api/notes', json={'title': 'Alt', 'content': ''}).get_json()['id']
+    response = client.post('/api/notes', json={'id': note_id, 'autosave': True, 'title': 'Neu', 'content': 'Text'})
+    assert response.status_code == 202
+
+    assert client.get(f'/api/notes/{note_id}').get_json()['content'] == 'Text'
+    app.note_autosave_buffer.flush()
+    with app.app.app_context():
+        assert app.db.session.get(app.Note, note_id).content == 'Text'
+
+
+def test_shared_buffer_is_seen_by_other_worker(tmp_path):
+    flushed = []
+    worker_a = SharedWriteBehindBuffer(flushed.append, str(tmp_path), interval=60)
+    worker_b = SharedWriteBehindBuffer(flushed.append, str(tmp_path), interval=60)
+
+    first = worker_a.put((1, 2), {'content': 'a'})
+    second = worker_b.put((1, 2), {'content': 'b'})
+    assert second == first + 1
+    assert worker_a.get((1, 2))['content'] == 'b'
+
+    # Der andere Worker schreibt auch die Werte von worker_a
+    assert worker_b.flush() == 1
+    assert flushed == [{(1, 2): {'content': 'b', 'seq': second}}]
+    assert worker_a.get((1, 2)) is None
+    worker_a.stop()
+    worker_b.stop()
+
+
+def test_shared_buffer_keeps_entries_when_flush_fails(tmp_path):
+    def fail(entries):
+        raise RuntimeError('Datenbank weg')
+
+    buffer = SharedWriteBehindBuffer(fail, str(tmp_path), interval=60)
+    buffer.put((1, 2), {'content': 'a'})
+    assert buffer.flush() == 0
+    assert buffer.get((1, 2))['content'] == 'a'
+
+    buffer.flush_fn = lambda entries: None
+    assert buffer.flush() == 1
+    assert buffer.get((1, 2)) is None
+    buffer.stop()
+
+
+def test_shared_buffer_update_is_compare_and_set(tmp_path):
+    worker_a = SharedWriteBehindBuffer(lambda entries: None, str(tmp_path), interval=60)
+    worker_b = SharedWriteBehindBuffer(lambda entries: None, str(tmp_path), interval=60)
+
+    def bump(current):
+        return {'revision': (current or {'revision': 0})['revision'] + 1}
+
+    assert worker_a.update((1, 2), bump)['revision'] == 1
+    assert worker_b.update((1, 2), bump)['revision'] == 2
+    assert worker_a.update((1, 2), lambda current: None) is None
+
+    # Innerhalb von locked() schreiben put() und discard() ohne erneut zu sperren
+    with worker_a.locked():
+        worker_a.put((1, 2), {'revision': 5})
+        worker_a.discard((1, 2))
+    assert worker_b.get((1, 2)) is None
+    worker_a.stop()
+    worker_b.stop()
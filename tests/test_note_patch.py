@@ -0,0 +1,78 @@
+"""Delta-Saves: base_revision wird gegen die Revision im Schreibpuffer geprüft, geschrieben wird erst beim Flush"""
+
+from sqlalchemy import event
+
+
+def create_note(client, content):
+    return client.post('/api/notes', json={'title': 'Notiz', 'content': content}).get_json()
+
+
+def stored(app, note_id):
+    with app.app.app_context():
+        note = app.db.session.get(app.Note, note_id)
+        return note.revision, note.content
+
+
+def test_patch_applies_delta_and_rejects_stale_base(app, user, client):
+    note = create_note(client, 'Hallo Welt')
+    patch = {'base_revision': note['revision'], 'delta': {'start': 6, 'end': 10, 'text': 'Notiz'}}
+    response = client.patch(f'/api/notes/{note["id"]}', json=patch)
+    assert response.status_code == 202
+    assert response.get_json()['revision'] == note['revision'] + 1
+
+    stale = client.patch(f'/api/notes/{note["id"]}', json=patch)
+    assert stale.status_code == 409
+    assert stale.get_json()['revision'] == note['revision'] + 1
+
+    app.note_autosave_buffer.flush()
+    assert stored(app, note['id']) == (note['revision'] + 1, 'Hallo Notiz')
+
+
+def test_saves_within_interval_write_once(app, user, client):
+    note = create_note(client, '')
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE note '):
+            statements.append(statement)
+
+    with app.app.app_context():
+        engine = app.db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            saved = client.post('/api/notes', json={'id': note['id'], 'autosave': True, 'title': 'Notiz', 'content': 'abc'}).get_json()
+            revision = saved['revision']
+            for text in 'defg':
+                patch = {'base_revision': revision, 'delta': {'start': 0, 'end': 0, 'text': text}}
+                response = client.patch(f'/api/notes/{note["id"]}', json=patch)
+                assert response.status_code == 202
+                revision = response.get_json()['revision']
+            assert statements == []
+            # Die Revision steht bis zum Flush nur im Puffer
+            assert stored(app, note['id']) == (note['revision'], '')
+
+            app.note_autosave_buffer.flush()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    assert len(statements) == 1
+    assert revision == note['revision'] + 5
+    assert stored(app, note['id']) == (revision, 'gfedabc')
+
+
+def test_direct_save_wins_over_pending_flush(app, user, client):
+    note = create_note(client, '')
+    client.post('/api/notes', json={'id': note['id'], 'autosave': True, 'title': 'Notiz', 'content': 'alt'})
+    entries = app.note_autosave_buffer._take()
+
+    client.post('/api/notes', json={'id': note['id'], 'title': 'Notiz', 'content': 'neu'})
+    app.write_note_autosaves(entries)
+    app.note_autosave_buffer._done(entries)
+    assert stored(app, note['id'])[1] == 'neu'
+
+
+def test_patch_with_invalid_base_is_rejected(app, user, client):
+    note = create_note(client, 'x')
+    response = client.patch(f'/api/notes/{note["id"]}', json={'base_revision': 'eins'})
+    assert response.status_code == 409
+    assert client.patch('/api/notes/999999', json={'base_revision': 0}).status_code == 404
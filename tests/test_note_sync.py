@@ -0,0 +1,54 @@
+"""Delta-Sync der Notizen: change_seq aus dem atomaren Zähler, alte Tombstones werden aufgeräumt"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+
+def create_note(client, title):
+    return client.post('/api/notes', json={'title': title, 'content': ''}).get_json()['id']
+
+
+def test_change_seq_follows_concurrent_increment(app, user, client):
+    cursor = int(client.get('/api/notes').headers['X-Sync-Cursor'])
+    with app.app.app_context():
+        with app.db.engine.begin() as other:
+            other.execute(text('UPDATE user SET data_version = data_version + 3 WHERE id = :id'), {'id': user})
+
+    note_id = create_note(client, 'Einkauf')
+    with app.app.app_context():
+        change_seq = app.db.session.get(app.Note, note_id).change_seq
+    assert change_seq == cursor + 4
+
+    changes = client.get(f'/api/notes?since={cursor}').get_json()
+    assert [note['id'] for note in changes['notes']] == [note_id]
+    assert changes['cursor'] == change_seq
+
+
+def test_deleted_notes_are_synced(app, user, client):
+    note_id = create_note(client, 'Alt')
+    cursor = int(client.get('/api/notes').headers['X-Sync-Cursor'])
+    client.delete(f'/api/notes/{note_id}')
+    assert client.get(f'/api/notes?since={cursor}').get_json()['deleted'] == [note_id]
+
+
+def test_expired_tombstones_require_full_resync(app, user, client):
+    old_id = create_note(client, 'Alt')
+    stale_cursor = int(client.get('/api/notes').headers['X-Sync-Cursor'])
+    client.delete(f'/api/notes/{old_id}')
+    with app.app.app_context():
+        app.NoteTombstone.query.update({'deleted_at': datetime.utcnow() - timedelta(days=365)})
+        app.db.session.commit()
+
+    # Die nächste Löschung räumt den abgelaufenen Tombstone auf
+    new_id = create_note(client, 'Neu')
+    client.delete(f'/api/notes/{new_id}')
+    with app.app.app_context():
+        assert [t.note_id for t in app.NoteTombstone.query.all()] == [new_id]
+
+    response = client.get(f'/api/notes?since={stale_cursor}')
+    assert response.status_code == 410
+    assert response.get_json() == {'error': 'resync_required'}
+
+    fresh_cursor = client.get('/api/notes').headers['X-Sync-Cursor']
+    assert client.get(f'/api/notes?since={fresh_cursor}').status_code == 200
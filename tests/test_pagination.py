@@ -0,0 +1,53 @@
+"""Keyset-Cursor und limit: fehlerhafte Eingaben ergeben 400 statt 500"""
+
+import base64
+import json
+
+import pytest
+
+
+def make_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.parametrize('values', [
+    [1],
+    {'a': 1},
+    'text',
+    [True, 3, 5, 1],
+    [True, 3, '2026-01-01T00:00:00'],
+    [1, 3, '2026-01-01T00:00:00', 1],
+    [False, 3, 'kein Datum', 1],
+])
+def test_group_todos_rejects_malformed_cursor(app, user, client, values):
+    with app.app.app_context():
+        group = app.TaskGroup(name='Arbeit', user_id=user)
+        app.db.session.add(group)
+        app.db.session.commit()
+        group_id = group.id
+    response = client.get(f'/api/groups/{group_id}/todos?cursor={make_cursor(values)}')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('values', [[5], ['2026-01-01T00:00:00', '7'], [None, 1], [20260101, 1]])
+def test_notes_rejects_malformed_cursor(client, values):
+    assert client.get(f'/api/notes?cursor={make_cursor(values)}').status_code == 400
+
+
+def test_notes_limit_is_at_least_one(app, user, client):
+    for i in range(3):
+        client.post('/api/notes', json={'title': f'Notiz {i}', 'content': ''})
+    for limit in (0, -5):
+        response = client.get(f'/api/notes?limit={limit}')
+        assert response.status_code == 200
+        assert len(response.get_json()) == 1
+        assert 'X-Next-Cursor' in response.headers
+
+
+def test_notes_cursor_round_trip(app, user, client):
+    for i in range(3):
+        client.post('/api/notes', json={'title': f'Notiz {i}', 'content': ''})
+    first = client.get('/api/notes?limit=2')
+    second = client.get('/api/notes?limit=2&cursor=' + first.headers['X-Next-Cursor'])
+    titles = [note['title'] for note in first.get_json() + second.get_json()]
+    assert sorted(titles) == ['Notiz 0', 'Notiz 1', 'Notiz 2']
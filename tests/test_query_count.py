@@ -0,0 +1,46 @@
+"""Die Startseite braucht unabhängig von der Anzahl der Todos gleich viele Queries"""
+
+from bulk import bulk_insert
+
+
+def seed_group(app, user_id, parents, sub_todos):
+    with app.app.app_context():
+        group = app.TaskGroup(name='Arbeit', user_id=user_id)
+        app.db.session.add(group)
+        app.db.session.flush()
+        todos = bulk_insert(app.db.session, app.Todo, [{
+            'title': f'Todo {i}',
+            'group_id': group.id,
+            'priority': 'medium',
+            'priority_rank': app.PRIORITY_RANKS['medium']
+        } for i in range(parents)], returning=[app.Todo.id])
+        bulk_insert(app.db.session, app.Todo, [{
+            'title': f'Sub-Todo {j}',
+            'group_id': group.id,
+            'parent_id': todo.id,
+            'priority': 'medium',
+            'priority_rank': app.PRIORITY_RANKS['medium']
+        } for todo in todos for j in range(sub_todos)])
+        app.db.session.commit()
+        return group.id
+
+
+def index_query_count(client, group_id):
+    response = client.get(f'/?group_id={group_id}')
+    assert response.status_code == 200
+    return int(response.headers['X-Query-Count'])
+
+
+def test_index_query_count_is_constant(app, user, client):
+    small = seed_group(app, user, parents=2, sub_todos=1)
+    large = seed_group(app, user, parents=40, sub_todos=10)
+
+    baseline = index_query_count(client, small)
+    assert baseline > 0
+    assert index_query_count(client, large) == baseline
+
+
+def test_index_renders_all_sub_todos(app, user, client):
+    group_id = seed_group(app, user, parents=3, sub_todos=4)
+    html = client.get(f'/?group_id={group_id}').get_data(as_text=True)
+    assert html.count('Sub-Todo 3') == 3
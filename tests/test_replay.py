@@ -0,0 +1,50 @@
+"""replay.Replayer: Wiederholung nach 409 wird als eigene Route gemessen"""
+
+import json
+from types import SimpleNamespace
+
+import replay
+
+
+class FakeTarget:
+    """Antwortet auf den ersten PATCH mit 409 und der aktuellen Revision, danach mit 202"""
+
+    def __init__(self):
+        self.bodies = []
+        self.last_body = ''
+
+    def request(self, user_id, method, path, headers, form, json_body):
+        self.bodies.append(json_body)
+        if len(self.bodies) == 1:
+            self.last_body = json.dumps({'error': 'stale_base', 'revision': 7})
+            return 409
+        self.last_body = json.dumps({'id': 11, 'revision': 8})
+        return 202
+
+
+def test_patch_retry_is_recorded_separately():
+    mapping = replay.DatasetMapping({'users': {'1': {'groups': [1], 'todos': [1], 'notes': [11]}}})
+    entry = {'time': 0, 'client': 1, 'route': 'note_patch', 'params': {'note': 1}, 'status': 202}
+    replayer = replay.Replayer([entry], mapping, SimpleNamespace(speed=0, concurrency=1), {})
+    target = replayer.local.target = FakeTarget()
+
+    replayer.send(entry, 0, 0)
+
+    assert [body['base_revision'] for body in target.bodies] == [None, 7]
+    assert set(replayer.latencies) == {'note_patch', 'note_patch_retry'}
+    assert replayer.errors == {'note_patch': 0, 'note_patch_retry': 0}
+    assert replayer.revisions == {11: 8}
+
+
+def test_failed_send_is_recorded_as_error(capsys):
+    # User ohne Notizen: die Zuordnung der Notiz-ID schlägt in send() fehl
+    mapping = replay.DatasetMapping({'users': {'1': {'groups': [1], 'todos': [1], 'notes': []}}})
+    entries = [{'time': 0, 'client': 1, 'route': 'note_get', 'params': {'note': 1}, 'status': 200}] * 2
+    # Ohne Server: die Verbindung wird erst beim ersten Request aufgebaut
+    replayer = replay.Replayer(entries, mapping, SimpleNamespace(speed=0, concurrency=1), {'port': 9})
+
+    replayer.run()
+
+    assert replayer.errors == {'note_get': 2}
+    assert replayer.latencies == {'note_get': []}
+    assert '2x nicht gesendet, note_get: ZeroDivisionError' in capsys.readouterr().out
@@ -0,0 +1,89 @@
+"""Batch-API: ungültige Felder und Änderungen einzelner Sub-Todos werden als BatchError (422) abgelehnt"""
+
+import pytest
+
+
+@pytest.fixture
+def todos(app, user):
+    with app.app.app_context():
+        work = app.TaskGroup(name='Arbeit', user_id=user)
+        home = app.TaskGroup(name='Zuhause', user_id=user)
+        app.db.session.add_all([work, home])
+        app.db.session.flush()
+        parent = app.Todo(title='Umzug', group_id=work.id)
+        app.db.session.add(parent)
+        app.db.session.flush()
+        child = app.Todo(title='Kartons', group_id=work.id, parent_id=parent.id)
+        app.db.session.add(child)
+        app.db.session.commit()
+        return {'work': work.id, 'home': home.id, 'parent': parent.id, 'child': child.id}
+
+
+def batch(client, *operations):
+    return client.post('/api/todos/batch', json={'operations': list(operations)})
+
+
+@pytest.mark.parametrize('fields', [
+    {'title': 42},
+    {'title': ''},
+    {'title': 'x' * 201},
+    {'description': ['a']},
+    {'priority': 'sofort'},
+    {'completed': 'ja'},
+    {'due_date': 12},
+])
+def test_update_rejects_invalid_fields(app, client, todos, fields):
+    response = batch(client, dict({'op': 'update', 'id': todos['parent']}, **fields))
+    assert response.status_code == 422
+    with app.app.app_context():
+        todo = app.db.session.get(app.Todo, todos['parent'])
+        assert (todo.title, todo.priority, todo.completed) == ('Umzug', 'medium', False)
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'update', 'id': [1]},
+    {'op': 'move', 'id': 1, 'group_id': {'id': 1}},
+    {'op': 'create', 'title': 'Neu', 'group_id': [1]},
+])
+def test_unhashable_ids_are_rejected(client, todos, operation):
+    assert batch(client, operation).status_code == 422
+
+
+def test_update_applies_valid_fields(app, client, todos):
+    response = batch(client, {'op': 'update', 'id': todos['parent'], 'priority': 'urgent', 'completed': True})
+    assert response.status_code == 200
+    with app.app.app_context():
+        todo = app.db.session.get(app.Todo, todos['parent'])
+        assert (todo.priority, todo.priority_rank, todo.completed) == ('urgent', 1, True)
+
+
+def test_move_rejects_sub_todo(app, client, todos):
+    response = batch(client, {'op': 'move', 'id': todos['child'], 'group_id': todos['home']})
+    assert response.status_code == 422
+    with app.app.app_context():
+        assert app.db.session.get(app.Todo, todos['child']).group_id == todos['work']
+
+
+def test_move_takes_sub_todos_along(app, client, todos):
+    assert batch(client, {'op': 'move', 'id': todos['parent'], 'group_id': todos['home']}).status_code == 200
+    with app.app.app_context():
+        assert app.db.session.get(app.Todo, todos['child']).group_id == todos['home']
+
+
+def test_priority_update_applies_to_sub_todos(app, client, todos):
+    response = batch(client,
+                     {'op': 'update', 'id': todos['parent'], 'priority': 'high'},
+                     {'op': 'create', 'title': 'Klebeband', 'parent_id': todos['parent'], 'priority': 'low'})
+    assert response.status_code == 200
+    created = response.get_json()['results'][1]['id']
+    with app.app.app_context():
+        for todo_id in (todos['child'], created):
+            todo = app.db.session.get(app.Todo, todo_id)
+            assert (todo.priority, todo.priority_rank) == ('high', 2)
+
+
+def test_priority_update_rejects_sub_todo(app, client, todos):
+    response = batch(client, {'op': 'update', 'id': todos['child'], 'priority': 'urgent'})
+    assert response.status_code == 422
+    with app.app.app_context():
+        assert app.db.session.get(app.Todo, todos['child']).priority == 'medium'
@@ -0,0 +1,280 @@
+"""
+Write-Behind-Puffer für häufige, überschreibende Schreibvorgänge (z.B. Notiz-Autosave)
+
+Schreibvorgänge werden pro Schlüssel zusammengefasst: kommt für denselben
+Schlüssel ein neuer Wert, ersetzt er den alten. Ein Hintergrund-Thread
+übergibt alle gesammelten Werte einmal pro Intervall an eine Flush-Funktion,
+die sie in einer einzigen Transaktion schreibt.
+
+WriteBehindBuffer hält die Werte im Speicher des Prozesses: jeder gunicorn-
+Worker hat seinen eigenen Puffer und seine eigene Sequenznummer, andere
+Worker sehen die Werte erst nach dem Flush. SharedWriteBehindBuffer legt sie
+stattdessen in einem gemeinsamen Verzeichnis ab, damit jeder Worker auf
+demselben Host den noch nicht geschriebenen Stand lesen kann.
+"""
+
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('todo_app')
+
+
+class WriteBehindBuffer:
+
+    def __init__(self, flush_fn, interval=2.0):
+        # flush_fn(entries) bekommt ein dict {key: value} und schreibt alles auf einmal
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self._pending = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        atexit.register(self.stop)
+
+    def put(self, key, value):
+        """Puffert value für key und gibt die Sequenznummer des Schreibvorgangs zurück"""
+        self._ensure_thread()
+        with self._lock:
+            self._seq += 1
+            self._pending[key] = dict(value, seq=self._seq)
+            return self._seq
+
+    def get(self, key):
+        """Noch nicht geschriebener Wert für key (read-your-writes), sonst None"""
+        with self._lock:
+            return self._pending.get(key)
+
+    def update(self, key, fn):
+        """Compare-and-Set: fn(aktueller Wert oder None) liefert den neuen Wert
+
+        Läuft atomar gegenüber anderen Schreibvorgängen auf den Puffer. Gibt fn
+        None zurück, bleibt der Puffer unverändert. Ergebnis ist der gepufferte
+        Wert inkl. Sequenznummer (oder None).
+        """
+        self._ensure_thread()
+        with self._lock:
+            value = fn(self._pending.get(key))
+            if value is None:
+                return None
+            self._seq += 1
+            value = self._pending[key] = dict(value, seq=self._seq)
+            return value
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        """Schreibt alle gepufferten Werte sofort"""
+        with self._flush_lock:
+            entries = self._take()
+            if not entries:
+                return 0
+
+            try:
+                self.flush_fn(entries)
+            except Exception:
+                logger.exception('Flush des Schreibpuffers fehlgeschlagen', extra={'event': 'write_buffer_error'})
+                self._restore(entries)
+                return 0
+            self._done(entries)
+            return len(entries)
+
+    def _take(self):
+        with self._lock:
+            entries, self._pending = self._pending, {}
+        return entries
+
+    def _restore(self, entries):
+        # Zurücklegen, sofern inzwischen kein neuerer Wert eingetroffen ist
+        with self._lock:
+            for key, value in entries.items():
+                self._pending.setdefault(key, value)
+
+    def _done(self, entries):
+        pass
+
+    def stop(self):
+        """Beendet den Hintergrund-Thread und schreibt den Rest (Shutdown, Worker-Recycling)"""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._wakeup.set()
+            self._thread.join(timeout=self.interval * 5)
+            self._thread = None
+        self.flush()
+
+    def _ensure_thread(self):
+        # Threads überleben kein fork (gunicorn preload_app), daher pro Prozess starten
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        wakeup = self._wakeup
+        while not wakeup.is_set():
+            wakeup.wait(self.interval)
+            started = time.monotonic()
+            flushed = self.flush()
+            if flushed:
+                logger.debug('Schreibpuffer geschrieben', extra={
+                    'event': 'write_buffer_flush',
+                    'entries': flushed,
+                    'duration_ms': round((time.monotonic() - started) * 1000, 2)
+                })
+
+
+class SharedWriteBehindBuffer(WriteBehindBuffer):
+    """WriteBehindBuffer, dessen Werte als Dateien in `directory` liegen (alle Worker eines Hosts)
+
+    Pro Schlüssel gibt es eine Datei `<key>.pending`. Ein Flush benennt sie in
+    `<key>.flushing` um und löscht sie erst nach dem Commit, get() liest beide,
+    so gibt es kein Fenster, in dem weder Puffer noch Datenbank den Stand haben.
+    Es flusht immer nur ein Worker gleichzeitig (Lock-Datei).
+    """
+
+    def __init__(self, flush_fn, directory, interval=2.0):
+        super().__init__(flush_fn, interval)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._spool_lock = threading.RLock()
+        self._spool_depth = 0
+
+    @contextmanager
+    def locked(self):
+        """Exklusiver Zugriff auf den Puffer über alle Worker (z.B. für Compare-and-Set)
+
+        Verschachtelbar: put(), update() und discard() innerhalb von locked()
+        übernehmen den bereits gehaltenen Lock.
+        """
+        with self._spool_lock:
+            if self._spool_depth:
+                self._spool_depth += 1
+                try:
+                    yield
+                finally:
+                    self._spool_depth -= 1
+                return
+
+            with open(os.path.join(self.directory, '.lock'), 'a+') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._spool_depth = 1
+                try:
+                    yield
+                finally:
+                    self._spool_depth = 0
+
+    def put(self, key, value):
+        self._ensure_thread()
+        with self.locked():
+            seq = self._next_seq()
+            self._write(self._path(key, 'pending'), (key, dict(value, seq=seq)))
+            return seq
+
+    def get(self, key):
+        for state in ('pending', 'flushing'):
+            entry = self._read(self._path(key, state))
+            if entry is not None:
+                return entry[1]
+        return None
+
+    def update(self, key, fn):
+        self._ensure_thread()
+        with self.locked():
+            value = fn(self.get(key))
+            if value is None:
+                return None
+            value = dict(value, seq=self._next_seq())
+            self._write(self._path(key, 'pending'), (key, value))
+            return value
+
+    def discard(self, key):
+        with self.locked():
+            self._unlink(self._path(key, 'pending'))
+
+    def _take(self):
+        # Nicht blockierend: flusht gerade ein anderer Worker, übernimmt er auch diese Werte
+        self._flush_file = open(os.path.join(self.directory, '.flush'), 'a+')
+        try:
+            fcntl.flock(self._flush_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._flush_file.close()
+            return {}
+
+        with self.locked():
+            for path in glob.glob(os.path.join(self.directory, '*.pending')):
+                os.replace(path, path[:-len('pending')] + 'flushing')
+        # Auch Reste eines abgebrochenen Flushs mitnehmen
+        entries = {}
+        for path in glob.glob(os.path.join(self.directory, '*.flushing')):
+            entry = self._read(path)
+            if entry is not None:
+                entries[entry[0]] = entry[1]
+        if not entries:
+            self._flush_file.close()
+        return entries
+
+    def _restore(self, entries):
+        with self.locked():
+            for key in entries:
+                flushing = self._path(key, 'flushing')
+                if os.path.exists(self._path(key, 'pending')):
+                    self._unlink(flushing)
+                else:
+                    os.replace(flushing, self._path(key, 'pending'))
+        self._flush_file.close()
+
+    def _done(self, entries):
+        for key in entries:
+            self._unlink(self._path(key, 'flushing'))
+        self._flush_file.close()
+
+    def _next_seq(self):
+        # Gemeinsamer Zähler, damit Sequenznummern über Worker hinweg eindeutig sind
+        path = os.path.join(self.directory, '.seq')
+        try:
+            with open(path) as f:
+                seq = int(f.read() or 0) + 1
+        except FileNotFoundError:
+            seq = 1
+        tmp = f'{path}.{os.getpid()}'
+        with open(tmp, 'w') as f:
+            f.write(str(seq))
+        os.replace(tmp, path)
+        return seq
+
+    def _path(self, key, state):
+        return os.path.join(self.directory, '-'.join(str(part) for part in key) + '.' + state)
+
+    def _write(self, path, entry):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass